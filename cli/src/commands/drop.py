@@ -21,8 +21,10 @@ async def drop_command(
     settings, _ = load_config()
     services = ServiceFactory(settings)
 
-    indexing_service = services.get_indexing_service()
-
-    await indexing_service.delete(path)
+    try:
+        indexing_service = services.get_indexing_service()
+        await indexing_service.delete(path)
+    finally:
+        await services.aclose()
 
     delete_config(collection_name)
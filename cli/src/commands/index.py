@@ -32,8 +32,10 @@ async def index_command(
 
     services = ServiceFactory(settings)
 
-    indexing_service = services.get_indexing_service()
-
-    await indexing_service.index(path, force)
+    try:
+        indexing_service = services.get_indexing_service()
+        await indexing_service.index(path, force)
+    finally:
+        await services.aclose()
 
     save_config(settings, collection_name)
@@ -14,6 +14,9 @@ def mcp_command() -> None:
     from service_factory import ServiceFactory
 
     mcp = FastMCP("code-context-search")
+    # Kept for the server's lifetime so search caches and connection pools are
+    # shared across tool calls, one factory per indexed codebase
+    factories: dict[str, ServiceFactory] = {}
 
     @mcp.tool()
     async def search_code(
@@ -33,7 +36,12 @@ def mcp_command() -> None:
         """
         collection_name = get_collection_name(Path(path).expanduser().absolute())
         settings, _ = load_config(collection_name)
-        services = ServiceFactory(settings)
+        services = factories.get(collection_name)
+        if services is None or services.settings != settings:
+            stale = services
+            services = factories[collection_name] = ServiceFactory(settings)
+            if stale is not None:
+                await stale.aclose()
 
         search_service = services.get_search_service()
 
@@ -82,13 +82,15 @@ async def search_command(
 
     services = ServiceFactory(settings)
 
-    search_service = services.get_search_service()
-
-    results = await search_service.search(
-        path,
-        query,
-        top_k=limit,
-        threshold=threshold,
-    )
+    try:
+        search_service = services.get_search_service()
+        results = await search_service.search(
+            path,
+            query,
+            top_k=limit,
+            threshold=threshold,
+        )
+    finally:
+        await services.aclose()
 
     print_results(results, output)
@@ -2,7 +2,7 @@ import os
 from pathlib import Path
 
 import xxhash
-from pydantic import BaseModel, Field, HttpUrl, PositiveInt
+from pydantic import BaseModel, Field, HttpUrl, PositiveFloat, PositiveInt
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 DEFAULT_DIR = (Path.home() / ".code-context").expanduser().absolute()
@@ -24,6 +24,10 @@ class QdrantConfig(BaseModel):
         default=None,
         description="Qdrant API key",
     )
+    prefer_grpc: bool = Field(
+        default=False,
+        description="Talk to Qdrant over gRPC (port 6334), cheaper to decode than JSON",
+    )
 
 
 class EmbeddingConfig(BaseModel):
@@ -42,6 +46,14 @@ class EmbeddingConfig(BaseModel):
     size: PositiveInt = Field(
         default=768, description="Embedding size", multiple_of=2, le=2048
     )
+    timeout: PositiveFloat = Field(
+        default=30.0,
+        description="Seconds per attempt for a search query embedding",
+    )
+    batch_timeout: PositiveFloat = Field(
+        default=300.0,
+        description="Seconds per attempt for an indexing batch embedding",
+    )
 
 
 class ExplainerConfig(BaseModel):
@@ -119,6 +131,29 @@ class GraphConfig(BaseModel):
         default=None,
         description="FalkorDB password",
     )
+    max_connections: PositiveInt = Field(
+        default=32,
+        description="Connections kept to FalkorDB, bounds concurrent graph queries",
+    )
+
+
+class SearchConfig(BaseModel):
+
+    rrf_k: PositiveInt | None = Field(
+        default=None,
+        description="RRF constant for client-side fusion, unset uses Qdrant's fusion",
+    )
+    query_cache_ttl: float = Field(
+        default=60.0,
+        description="Seconds a cached search result is reused for similar queries",
+        ge=0,
+    )
+    query_cache_threshold: float = Field(
+        default=0.97,
+        description="Query embedding similarity needed to reuse a cached result",
+        ge=0,
+        le=1,
+    )
 
 
 class AppSettings(BaseSettings):
@@ -147,6 +182,7 @@ class AppSettings(BaseSettings):
     storage: StorageConfig = Field(default_factory=StorageConfig)
     logging: LoggingConfig = Field(default_factory=LoggingConfig)
     graph: GraphConfig = Field(default_factory=GraphConfig)
+    search: SearchConfig = Field(default_factory=SearchConfig)
 
 
 def load_config(collection_name: str | None = None) -> tuple[AppSettings, bool]:
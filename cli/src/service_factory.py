@@ -9,6 +9,7 @@ from core import (
     IndexingService,
     SearchService,
     TreeSitterSplitter,
+    make_http_client,
 )
 from core.sync import LocalFileContentReader, SnapshotFileStateRepository
 from loguru import logger
@@ -24,6 +25,8 @@ class ServiceFactory:
     def __init__(self, settings: AppSettings) -> None:
         self.settings = settings
         self._client: AsyncQdrantClient | None = None
+        # One connection pool for every OpenAI-compatible endpoint
+        self._http_client = make_http_client()
         self._code_embedding_service: EmbeddingService | None = None
         self._doc_embedding_service: EmbeddingService | None = None
         self._explainer_service: ExplainerService | None = None
@@ -49,11 +52,20 @@ class ServiceFactory:
             )
             logger.debug("Service factory initialized with debug logging")
 
+    async def aclose(self) -> None:
+        """Close the connection pools opened by the created services."""
+        await self._http_client.aclose()
+        if self._client is not None:
+            await self._client.close()
+        if self._graph_service is not None:
+            await self._graph_service.aclose()
+
     def get_client(self) -> AsyncQdrantClient:
         if not self._client:
             self._client = AsyncQdrantClient(
                 url=str(self.settings.qdrant.url),
                 api_key=self.settings.qdrant.api_key,
+                prefer_grpc=self.settings.qdrant.prefer_grpc,
                 timeout=120,
             )
         return self._client
@@ -65,6 +77,9 @@ class ServiceFactory:
                 self.settings.code_embedding.api_key,
                 self.settings.code_embedding.model,
                 self.settings.code_embedding.size,
+                http_client=self._http_client,
+                timeout=self.settings.code_embedding.timeout,
+                batch_timeout=self.settings.code_embedding.batch_timeout,
             )
         return self._code_embedding_service
 
@@ -78,6 +93,9 @@ class ServiceFactory:
                 self.settings.doc_embedding.api_key,
                 self.settings.doc_embedding.model,
                 self.settings.doc_embedding.size,
+                http_client=self._http_client,
+                timeout=self.settings.doc_embedding.timeout,
+                batch_timeout=self.settings.doc_embedding.batch_timeout,
             )
         return self._doc_embedding_service
 
@@ -91,6 +109,7 @@ class ServiceFactory:
                 self.settings.explainer.api_key,
                 self.settings.explainer.model,
                 self.settings.explainer.parallelism,
+                http_client=self._http_client,
             )
         return self._explainer_service
 
@@ -135,6 +154,7 @@ class ServiceFactory:
                 port=self.settings.graph.port,
                 username=self.settings.graph.username,
                 password=self.settings.graph.password,
+                max_connections=self.settings.graph.max_connections,
             )
         return self._graph_service
 
@@ -145,5 +165,8 @@ class ServiceFactory:
                 self.get_code_embedding_service(),
                 self.get_doc_embedding_service(),
                 self.get_graph_service(),
+                query_cache_ttl=self.settings.search.query_cache_ttl,
+                query_cache_threshold=self.settings.search.query_cache_threshold,
+                rrf_k=self.settings.search.rrf_k,
             )
         return self._search_service
@@ -3,9 +3,11 @@ from .services import (
     ExplainerService,
     GraphService,
     IndexingService,
+    SearchRequest,
     SearchResult,
     SearchService,
     get_collection_name,
+    make_http_client,
 )
 from .splitters import TreeSitterSplitter
 from .sync import FileSynchronizer
@@ -17,8 +19,10 @@ __all__ = [
     "EmbeddingService",
     "GraphService",
     "SearchService",
+    "SearchRequest",
     "SearchResult",
     "TreeSitterSplitter",
     "FileSynchronizer",
     "get_collection_name",
+    "make_http_client",
 ]
@@ -1,6 +1,12 @@
 from .indexing_service import IndexingService
-from .search_service import SearchResult, SearchService
-from .utils import EmbeddingService, ExplainerService, GraphService, get_collection_name
+from .search_service import SearchRequest, SearchResult, SearchService
+from .utils import (
+    EmbeddingService,
+    ExplainerService,
+    GraphService,
+    get_collection_name,
+    make_http_client,
+)
 
 __all__ = [
     "IndexingService",
@@ -8,6 +14,8 @@ __all__ = [
     "EmbeddingService",
     "GraphService",
     "SearchService",
+    "SearchRequest",
     "SearchResult",
     "get_collection_name",
+    "make_http_client",
 ]
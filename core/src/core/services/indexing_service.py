@@ -1,3 +1,4 @@
+import asyncio
 import itertools
 from dataclasses import dataclass
 from datetime import datetime, timezone
@@ -5,7 +6,7 @@ from pathlib import Path
 
 from loguru import logger
 from qdrant_client import AsyncQdrantClient, models
-from qdrant_client.models import FieldCondition, Filter, MatchValue
+from qdrant_client.models import FieldCondition, Filter, MatchAny
 
 from core.splitters import CodeChunk, Splitter
 from core.sync import FileSynchronizer
@@ -28,6 +29,7 @@ from .utils import (
 
 ITER_BATCH_SIZE = 128
 SCROLL_BATCH_SIZE = 512
+DELETE_BATCH_SIZE = 512
 
 
 @dataclass
@@ -116,24 +118,33 @@ class IndexingService:
 
         await self._delete_file_chunks(collection_name, results.to_remove)
         chunks = await self._get_chunks(codebase_path, results.to_add, self.splitter)
-        for chunk_batch in itertools.batched(chunks, ITER_BATCH_SIZE):
-            batch_list = list(chunk_batch)
-            if not batch_list:
-                continue
 
-            contents = [c.content for c in batch_list]
-            code_embeddings = await self.code_service.generate_embeddings(contents)
-
-            doc_embeddings: list[Embedding] | None = None
-            if self.doc_service is not None:
-                batch_list = await self._augment_with_explanations(batch_list)
-                doc_embeddings = await self.doc_service.generate_embeddings(
-                    [c.doc or "unknown" for c in batch_list]
-                )
+        # Upserts run in the background while the next batch is being embedded
+        async with asyncio.TaskGroup() as tg:
+            for chunk_batch in itertools.batched(chunks, ITER_BATCH_SIZE):
+                points = await self._embed_batch(list(chunk_batch))
+                tg.create_task(self.client.upsert(collection_name, points))
 
-            points = await self._get_points(batch_list, code_embeddings, doc_embeddings)
+    async def _embed_batch(self, chunks: list[CodeChunk]) -> list[models.PointStruct]:
+        contents = [c.content for c in chunks]
+        if self.doc_service is None:
+            code_embeddings = await self.code_service.generate_embeddings(contents)
+            return await self._get_points(chunks, code_embeddings)
 
-            await self.client.upsert(collection_name, points)
+        code_embeddings, (chunks, doc_embeddings) = await asyncio.gather(
+            self.code_service.generate_embeddings(contents),
+            self._get_doc_embeddings(self.doc_service, chunks),
+        )
+        return await self._get_points(chunks, code_embeddings, doc_embeddings)
+
+    async def _get_doc_embeddings(
+        self, doc_service: EmbeddingService, chunks: list[CodeChunk]
+    ) -> tuple[list[CodeChunk], list[Embedding]]:
+        chunks = await self._augment_with_explanations(chunks)
+        doc_embeddings = await doc_service.generate_embeddings(
+            [c.doc or "unknown" for c in chunks]
+        )
+        return chunks, doc_embeddings
 
     async def _augment_with_explanations(
         self, chunks: list[CodeChunk]
@@ -170,13 +181,14 @@ class IndexingService:
         code_embeddings: list[Embedding],
         doc_embeddings: list[Embedding] | None = None,
     ) -> list[models.PointStruct]:
+        # Built from typed chunks and embeddings, pydantic validation is skipped
         if doc_embeddings is None:
             return [
-                models.PointStruct(
+                models.PointStruct.model_construct(
                     id=chunk.id,
                     vector={
                         CODE_DENSE: emb,
-                        CODE_SPARSE: models.Document(
+                        CODE_SPARSE: models.Document.model_construct(
                             text=chunk.content, model=TEXT_EMBEDDING_MODEL
                         ),
                     },
@@ -192,15 +204,15 @@ class IndexingService:
                 for chunk, emb in zip(chunks, code_embeddings)
             ]
         return [
-            models.PointStruct(
+            models.PointStruct.model_construct(
                 id=chunk.id,
                 vector={
                     CODE_DENSE: code_emb,
                     DOC_DENSE: exp_emb,
-                    CODE_SPARSE: models.Document(
+                    CODE_SPARSE: models.Document.model_construct(
                         text=chunk.content, model=TEXT_EMBEDDING_MODEL
                     ),
-                    DOC_SPARSE: models.Document(
+                    DOC_SPARSE: models.Document.model_construct(
                         text=chunk.doc or "unknown", model=TEXT_EMBEDDING_MODEL
                     ),
                 },
@@ -221,15 +233,19 @@ class IndexingService:
         self, codebase_path: Path, files: list[str], splitter: Splitter
     ) -> list[CodeChunk]:
         all_chunks: list[CodeChunk] = []
-        for file in files:
-            file_path = codebase_path / file
-            relative_path = file_path.relative_to(codebase_path)
-            try:
-                content = self.file_content_reader.read_text(file_path)
-                chunks = await splitter.split(content, relative_path)
+        # Splitting parses off the loop, so files in a batch overlap
+        for batch in itertools.batched(files, ITER_BATCH_SIZE):
+            items: list[tuple[str, Path]] = []
+            for file in batch:
+                file_path = codebase_path / file
+                try:
+                    items.append(
+                        (self.file_content_reader.read_text(file_path), Path(file))
+                    )
+                except Exception as e:
+                    logger.debug("Unable to read a file {} {}", file_path, e)
+            for chunks in await splitter.split_many(items):
                 all_chunks.extend(chunks)
-            except Exception as e:
-                logger.debug("Unable to read a file {} {}", file_path, e)
 
         return all_chunks
 
@@ -266,6 +282,7 @@ class IndexingService:
             CODE_DENSE: models.VectorParams(
                 size=code_size,
                 distance=models.Distance.COSINE,
+                on_disk=True,
             )
         }
 
@@ -277,6 +294,7 @@ class IndexingService:
             dense_vectors[DOC_DENSE] = models.VectorParams(
                 size=explanation_size,
                 distance=models.Distance.COSINE,
+                on_disk=True,
             )
             sparse_vectors[DOC_SPARSE] = models.SparseVectorParams(
                 modifier=models.Modifier.IDF
@@ -286,14 +304,32 @@ class IndexingService:
             collection_name=collection_name,
             vectors_config=dense_vectors,
             sparse_vectors_config=sparse_vectors,
+            on_disk_payload=True,
+            quantization_config=models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    always_ram=True,
+                )
+            ),
+        )
+
+        # Per-file deletes filter on relative_path, keep them off the full scan path
+        await self.client.create_payload_index(
+            collection_name=collection_name,
+            field_name="relative_path",
+            field_schema=models.PayloadSchemaType.KEYWORD,
         )
 
     async def _delete_file_chunks(
         self, collection_name: str, file_paths: list[str]
     ) -> None:
-        for path in file_paths:
+        for path_batch in itertools.batched(file_paths, DELETE_BATCH_SIZE):
             filter_condition = Filter(
-                must=[FieldCondition(key="relative_path", match=MatchValue(value=path))]
+                must=[
+                    FieldCondition(
+                        key="relative_path", match=MatchAny(any=list(path_batch))
+                    )
+                ]
             )
 
             await self.client.delete(collection_name, filter_condition)
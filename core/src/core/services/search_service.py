@@ -1,4 +1,6 @@
+import asyncio
 from dataclasses import dataclass
+from operator import itemgetter
 from pathlib import Path
 
 from loguru import logger
@@ -11,10 +13,31 @@ from .constants import (
     DOC_SPARSE,
     TEXT_EMBEDDING_MODEL,
 )
-from .utils import EmbeddingService, GraphService, get_collection_name
-
+from .utils import (
+    Embedding,
+    EmbeddingService,
+    GraphService,
+    SemanticQueryCache,
+    SingleFlight,
+    SparseQueryEncoder,
+    get_collection_name,
+)
 
-@dataclass
+# Payload keys SearchResult is built from, in field order, with their fallbacks
+RESULT_DEFAULTS: dict[str, object] = {
+    "content": "",
+    "doc": None,
+    "relative_path": "",
+    "start_line": 0,
+    "end_line": 0,
+    "language": "unknown",
+}
+# Only what SearchResult reads, indexed_at and future payload keys stay server-side
+RESULT_PAYLOAD = models.PayloadSelectorInclude(include=list(RESULT_DEFAULTS))
+_result_fields = itemgetter(*RESULT_DEFAULTS)
+
+
+@dataclass(frozen=True, slots=True)
 class SearchResult:
     content: str
     doc: str | None
@@ -25,6 +48,28 @@ class SearchResult:
     score: float
 
 
+@dataclass(frozen=True, slots=True)
+class SearchRequest:
+    query: str
+    top_k: int = 5
+    threshold: float = 0.5
+    max_graph_hops: int | None = None
+    graph_limit: int | None = None
+
+    def __post_init__(self) -> None:
+        if not self.query.strip():
+            raise ValueError("Search query cannot be empty")
+
+        if not (1 <= self.top_k <= 50):
+            raise ValueError("top_k must be between 1 and 50")
+
+        if not (0.0 <= self.threshold <= 1.0):
+            raise ValueError("threshold must be between 0.0 and 1.0")
+
+        if self.max_graph_hops is not None and self.max_graph_hops < 1:
+            raise ValueError("max_graph_hops must be >= 1 when provided")
+
+
 class SearchService:
 
     _DEFAULT_GRAPH_LIMIT = 30
@@ -35,75 +80,120 @@ class SearchService:
         code_serivce: EmbeddingService,
         doc_serivce: EmbeddingService | None,
         graph_service: GraphService | None = None,
+        query_cache_ttl: float = 60.0,
+        query_cache_threshold: float = 0.97,
+        rrf_k: int | None = None,
     ):
         self.client = client
         self.code_serivce = code_serivce
         self.doc_service = doc_serivce
         self.graph_service = graph_service
+        # None keeps Qdrant's built-in RRF, a value fuses client-side with that k
+        self.rrf_k = rrf_k
+        self._sparse_encoder = SparseQueryEncoder(TEXT_EMBEDDING_MODEL)
+        self._collection_names: dict[Path, str] = {}
+        self._known_collections: set[str] = set()
+        self._query_cache: SemanticQueryCache[list[SearchResult]] = SemanticQueryCache(
+            code_serivce.size, threshold=query_cache_threshold, ttl=query_cache_ttl
+        )
+        self._inflight: SingleFlight[
+            tuple[str, str, int, float], tuple[list[SearchResult], list[str]]
+        ] = SingleFlight()
 
     async def _perform_search(
         self,
         collection_name: str,
         query_text: str,
+        code_embedding: Embedding,
+        doc_embedding: Embedding | None = None,
         limit: int = 10,
         threshold: float = 0.0,
     ) -> tuple[list[SearchResult], list[str]]:
+        # One sparse encoding serves both the code and doc bm25 prefetches
+        sparse_query = await self._sparse_encoder.encode(query_text)
+        vectors: list[tuple[str, Embedding | models.SparseVector]] = [
+            (CODE_DENSE, code_embedding),
+            (CODE_SPARSE, sparse_query),
+        ]
+        if doc_embedding is not None:
+            vectors += [(DOC_DENSE, doc_embedding), (DOC_SPARSE, sparse_query)]
+
+        # Inputs are already well typed, skip pydantic validation per prefetch
         prefetch = [
-            models.Prefetch(
-                query=await self.code_serivce.generate_embedding(query_text),
-                using=CODE_DENSE,
-                limit=limit,
-            ),
-            models.Prefetch(
-                query=models.Document(text=query_text, model=TEXT_EMBEDDING_MODEL),
-                using=CODE_SPARSE,
-                limit=limit,
-            ),
+            models.Prefetch.model_construct(query=query, using=using, limit=limit)
+            for using, query in vectors
         ]
 
-        if self.doc_service is not None:
-            prefetch.append(
-                models.Prefetch(
-                    query=await self.doc_service.generate_embedding(query_text),
-                    using=DOC_DENSE,
-                    limit=limit,
-                ),
+        points = await self._fuse(collection_name, prefetch, limit, threshold)
+
+        results = [
+            SearchResult(
+                *_result_fields(RESULT_DEFAULTS | (point.payload or {})),
+                score=point.score,
             )
-            prefetch.append(
-                models.Prefetch(
-                    query=models.Document(text=query_text, model=TEXT_EMBEDDING_MODEL),
-                    using=DOC_SPARSE,
-                    limit=limit,
-                ),
+            for point in points
+        ]
+        point_ids = [str(point.id) for point in points]
+
+        logger.debug("Found {} results for text query", len(results))
+        return results, point_ids
+
+    async def _fuse(
+        self,
+        collection_name: str,
+        prefetch: list[models.Prefetch],
+        limit: int,
+        threshold: float,
+    ) -> list[models.ScoredPoint]:
+        if self.rrf_k is None:
+            search_result = await self.client.query_points(
+                collection_name=collection_name,
+                prefetch=prefetch,
+                query=models.FusionQuery(fusion=models.Fusion.RRF),
+                limit=limit,
+                score_threshold=threshold,
+                with_payload=RESULT_PAYLOAD,
             )
+            return search_result.points
 
-        search_result = await self.client.query_points(
+        # qdrant-client does not expose the RRF constant, so rank lists are
+        # fetched id-only in one batch and fused here. Fused scores are rank
+        # sums, so the threshold filters each rank list instead
+        responses = await self.client.query_batch_points(
             collection_name=collection_name,
-            prefetch=prefetch,
-            query=models.FusionQuery(fusion=models.Fusion.RRF),
-            limit=limit,
-            score_threshold=threshold,
+            requests=[
+                models.QueryRequest(
+                    query=p.query,
+                    using=p.using,
+                    limit=p.limit,
+                    score_threshold=threshold,
+                    with_payload=False,
+                )
+                for p in prefetch
+            ],
         )
+        scores: dict[models.ExtendedPointId, float] = {}
+        for response in responses:
+            for rank, point in enumerate(response.points, start=1):
+                scores[point.id] = scores.get(point.id, 0.0) + 1.0 / (self.rrf_k + rank)
 
-        results = []
-        point_ids: list[str] = []
-        for point in search_result.points:
-            payload = point.payload or {}
-            point_ids.append(str(point.id))
-            results.append(
-                SearchResult(
-                    content=payload.get("content", ""),
-                    doc=payload.get("doc", None),
-                    relative_path=payload.get("relative_path", ""),
-                    start_line=payload.get("start_line", 0),
-                    end_line=payload.get("end_line", 0),
-                    language=payload.get("language", "unknown"),
-                    score=point.score,
-                )
-            )
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        if not top:
+            return []
 
-        logger.debug("Found {} results for text query", len(results))
-        return results, point_ids
+        records = await self.client.retrieve(
+            collection_name,
+            ids=[point_id for point_id, _ in top],
+            with_payload=RESULT_PAYLOAD,
+        )
+        payloads = {record.id: record.payload for record in records}
+        return [
+            models.ScoredPoint(
+                id=point_id, version=0, score=score, payload=payloads.get(point_id)
+            )
+            for point_id, score in top
+            if point_id in payloads
+        ]
 
     async def search(
         self,
@@ -119,7 +209,6 @@ class SearchService:
         Args:
             codebase_path: Path to the codebase to search in
             query: Search query (must not be empty)
-            has_explanations: Whether codebase was indexed with explanation vector
             top_k: Number of results to return (1-50)
             threshold: Similarity threshold (0.0-1.0)
             max_graph_hops: Optional graph expansion depth (>=1) to augment results
@@ -132,24 +221,88 @@ class SearchService:
             CollectionNotIndexedError: If the codebase is not indexed
             ValueError: If query is empty or parameters are invalid
         """
-        if not query or query.strip() == "":
-            raise ValueError("Search query cannot be empty")
+        return await self.search_request(
+            codebase_path,
+            SearchRequest(query, top_k, threshold, max_graph_hops, graph_limit),
+        )
 
-        if not (1 <= top_k <= 50):
-            raise ValueError("top_k must be between 1 and 50")
+    async def search_request(
+        self, codebase_path: Path, request: SearchRequest
+    ) -> list[SearchResult]:
+        """Search indexed code with an already validated request.
 
-        if not (0.0 <= threshold <= 1.0):
-            raise ValueError("threshold must be between 0.0 and 1.0")
+        Args:
+            codebase_path: Path to the codebase to search in
+            request: Search parameters
 
-        if max_graph_hops is not None and max_graph_hops < 1:
-            raise ValueError("max_graph_hops must be >= 1 when provided")
+        Returns:
+            List of search results
+
+        Raises:
+            CollectionNotIndexedError: If the codebase is not indexed
+        """
+        collection_name = await self._resolve_collection(codebase_path)
+
+        logger.debug("Searching with query: '{}'", request.query)
+        query_embedding, doc_embedding = await self._embed_query(request.query)
+        cache_scope = (
+            collection_name,
+            request.top_k,
+            request.threshold,
+            request.max_graph_hops,
+            request.graph_limit,
+        )
+        cached = self._query_cache.get(cache_scope, query_embedding)
+        if cached is not None:
+            logger.debug("Semantic cache hit for query: '{}'", request.query)
+            return list(cached)
+
+        # Identical concurrent queries share one Qdrant round-trip
+        try:
+            results, point_ids = await self._inflight.run(
+                (collection_name, request.query, request.top_k, request.threshold),
+                lambda: self._perform_search(
+                    collection_name,
+                    request.query,
+                    query_embedding,
+                    doc_embedding,
+                    request.top_k,
+                    request.threshold,
+                ),
+            )
+        except Exception:
+            # The collection may have been dropped since it was last checked
+            self._known_collections.discard(collection_name)
+            raise
+        results = list(results)
 
-        codebase_path = codebase_path.expanduser().absolute().resolve()
+        final_results = await self._expand_with_graph(
+            collection_name,
+            results,
+            point_ids,
+            request.graph_limit or self._DEFAULT_GRAPH_LIMIT,
+            request.max_graph_hops,
+        )
 
-        collection_name = get_collection_name(codebase_path)
+        self._query_cache.put(cache_scope, query_embedding, list(final_results))
+
+        logger.debug("Found {} relevant results", len(final_results))
+        return final_results
+
+    async def _resolve_collection(self, codebase_path: Path) -> str:
+        collection_name = self._collection_names.get(codebase_path)
+        if collection_name is None:
+            resolved = codebase_path.expanduser().absolute().resolve()
+            collection_name = get_collection_name(resolved)
+            # Relative paths depend on the working directory, resolve them each time
+            if codebase_path.expanduser().is_absolute():
+                self._collection_names[codebase_path] = collection_name
 
         logger.debug("Searching in codebase: {}", codebase_path)
 
+        if collection_name in self._known_collections:
+            return collection_name
+
         if not await self.client.collection_exists(collection_name):
             logger.warning(
                 "Collection '{}' does not exist for codebase '{}'",
@@ -160,21 +313,23 @@ class SearchService:
                 f"Collection not indexed {collection_name}, path: {codebase_path}"
             )
 
-        logger.debug("Searching with query: '{}'", query)
-        results, point_ids = await self._perform_search(
-            collection_name, query, top_k, threshold
-        )
+        self._known_collections.add(collection_name)
+        return collection_name
 
-        final_results = await self._expand_with_graph(
-            collection_name,
-            results,
-            point_ids,
-            graph_limit or self._DEFAULT_GRAPH_LIMIT,
-            max_graph_hops,
-        )
+    async def _embed_query(self, query: str) -> tuple[Embedding, Embedding | None]:
+        if self.doc_service is None:
+            return await self.code_serivce.generate_embedding(query), None
 
-        logger.debug("Found {} relevant results", len(final_results))
-        return final_results
+        # Same deployment on both sides, one request serves both prefetches
+        if self.code_serivce.is_equivalent(self.doc_service):
+            embedding = await self.code_serivce.generate_embedding(query)
+            return embedding, embedding
+
+        code_embedding, doc_embedding = await asyncio.gather(
+            self.code_serivce.generate_embedding(query),
+            self.doc_service.generate_embedding(query),
+        )
+        return code_embedding, doc_embedding
 
     async def _expand_with_graph(
         self,
@@ -203,26 +358,22 @@ class SearchService:
             return seeds
 
         logger.debug(
-            "Graph expansion requested (hops=%d) produced %d nodes",
+            "Graph expansion requested (hops={}) produced {} nodes",
             max_graph_hops,
             len(graph_nodes),
         )
 
-        result_by_id: dict[str, SearchResult] = {}
-        ordered_results: list[SearchResult] = []
-
-        for idx, seed in enumerate(seeds):
-            if idx >= len(seed_ids):
-                break
-            seed_id = seed_ids[idx]
-            result_by_id[seed_id] = seed
-            ordered_results.append(seed)
+        # Insertion ordered, seeds first; graph_limit bounds the expansion but
+        # never drops direct hits when top_k is larger than it
+        result_by_id = dict(zip(seed_ids, seeds))
+        limit = max(limit, len(result_by_id))
 
         for node in graph_nodes:
-            node_id = node.id
-            if not node_id or node_id in result_by_id:
+            if len(result_by_id) >= limit:
+                break
+            if not node.id or node.id in result_by_id:
                 continue
-            result = SearchResult(
+            result_by_id[node.id] = SearchResult(
                 content=node.content or "",
                 doc=node.doc,
                 relative_path=node.relative_path or "",
@@ -231,10 +382,5 @@ class SearchService:
                 language=node.language or "unknown",
                 score=0.0,
             )
-            result_by_id[node_id] = result
-            ordered_results.append(result)
-
-            if len(ordered_results) >= limit:
-                break
 
-        return ordered_results[:limit]
+        return list(result_by_id.values())
@@ -2,6 +2,10 @@ from .collection_name import get_collection_name
 from .embedding_service import Embedding, EmbeddingService
 from .explainer_service import ExplainerService
 from .graph_service import GraphService, GraphNode
+from .http_client import make_http_client
+from .query_cache import SemanticQueryCache
+from .single_flight import SingleFlight
+from .sparse_encoder import SparseQueryEncoder
 
 __all__ = [
     "EmbeddingService",
@@ -9,5 +13,9 @@ __all__ = [
     "ExplainerService",
     "GraphService",
     "GraphNode",
+    "SemanticQueryCache",
+    "SingleFlight",
+    "SparseQueryEncoder",
     "get_collection_name",
+    "make_http_client",
 ]
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from pathlib import Path
 
 import xxhash
@@ -6,5 +7,11 @@ PREFIX = "code_chunks_"
 
 
 def get_collection_name(path: Path) -> str:
-    path_hash = xxhash.xxh3_64_hexdigest(str(path.absolute()).encode("utf-8"))
-    return f"code_chunks_{path_hash[:8]}"
+    return _collection_name(str(path.absolute()))
+
+
+@lru_cache(maxsize=256)
+def _collection_name(absolute_path: str) -> str:
+    # High 32 bits are the leading 8 hex digits, names of existing collections
+    path_hash = xxhash.xxh3_64_intdigest(absolute_path.encode("utf-8"))
+    return f"{PREFIX}{path_hash >> 32:08x}"
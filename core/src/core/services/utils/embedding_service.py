@@ -1,13 +1,14 @@
+import asyncio
 import itertools
+from array import array
+from collections import OrderedDict
 
-from loguru import logger
-from openai import AsyncOpenAI, RateLimitError
-from tenacity import (
-    retry,
-    retry_if_exception_type,
-    stop_after_attempt,
-    wait_exponential,
-)
+import httpx
+import xxhash
+from openai import AsyncOpenAI
+
+from .retry import openai_retry
+from .single_flight import SingleFlight
 
 Embedding = list[float]
 
@@ -15,45 +16,153 @@ Embedding = list[float]
 class EmbeddingService:
 
     def __init__(
-        self, base_url: str, api_key: str, model: str, size: int, batch_size: int = 32
+        self,
+        base_url: str,
+        api_key: str,
+        model: str,
+        size: int,
+        batch_size: int = 32,
+        cache_size: int = 4096,
+        batch_hold: float = 0.01,
+        http_client: httpx.AsyncClient | None = None,
+        timeout: float = 30.0,
+        batch_timeout: float = 300.0,
     ) -> None:
-        self._openai = AsyncOpenAI(base_url=base_url, api_key=api_key)
+        self._openai = AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            http_client=http_client,
+            # Retries are owned by openai_retry, not stacked on the SDK's own
+            max_retries=0,
+        )
         self._model = model
         self._batch_size = batch_size
         self._size = size
+        # Per attempt, a timed out request is retried like any transient error.
+        # Interactive queries fail fast, indexing batches get the longer bound
+        self._timeout = timeout
+        self._batch_timeout = batch_timeout
+        # Content-addressed LRU, vectors kept as packed doubles so hits return the
+        # exact provider values without a float object per component
+        self._cache: OrderedDict[str, array] = OrderedDict()
+        self._cache_size = cache_size
+        self._inflight: SingleFlight[str, Embedding] = SingleFlight()
+        # Single queries overlapping an in-flight request share the next one
+        self._batch_hold = batch_hold
+        self._pending: list[tuple[str, asyncio.Future[Embedding]]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._flushes: set[asyncio.Task[None]] = set()
 
     @property
     def size(self) -> int:
         return self._size
 
-    @retry(
-        wait=wait_exponential(min=5, max=20),
-        stop=stop_after_attempt(3),
-        retry=retry_if_exception_type(RateLimitError),
-        before_sleep=lambda x: logger.warning("Rate limit hit {} {}", x.fn, x.args),
-    )
-    async def generate_embedding(self, query: str) -> Embedding:
-        response = await self._openai.embeddings.create(input=query, model=self._model)
-
-        return response.data[0].embedding
+    def is_equivalent(self, other: "EmbeddingService") -> bool:
+        """Whether both services produce the same vectors for the same input."""
+        return self is other or (
+            str(self._openai.base_url) == str(other._openai.base_url)
+            and self._openai.api_key == other._openai.api_key
+            and self._model == other._model
+            and self._size == other._size
+        )
 
-    @retry(
-        wait=wait_exponential(min=5, max=20),
-        stop=stop_after_attempt(3),
-        retry=retry_if_exception_type(RateLimitError),
-        before_sleep=lambda x: logger.warning("Rate limit hit {} {}", x.fn, x.args),
-    )
-    async def _get_embeddings(self, queries: list[str]) -> list[Embedding]:
+    @openai_retry
+    async def _get_embeddings(
+        self, queries: list[str], timeout: float
+    ) -> list[Embedding]:
         response = await self._openai.embeddings.create(
-            input=queries, model=self._model
+            input=queries, model=self._model, timeout=timeout
         )
         return [d.embedding for d in response.data]
 
+    async def generate_embedding(self, query: str) -> Embedding:
+        key = self._cache_key(query)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        return await self._inflight.run(key, lambda: self._fetch_embedding(key, query))
+
+    async def _fetch_embedding(self, key: str, query: str) -> Embedding:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[Embedding] = loop.create_future()
+        self._pending.append((query, future))
+        # A lone query goes out at once, only queries arriving while a request
+        # is in flight wait batch_hold to be sent together
+        if len(self._pending) >= self._batch_size or not self._flushes:
+            self._flush_pending()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._batch_hold, self._flush_pending)
+
+        embedding = await future
+        self._cache_put(key, embedding)
+        return embedding
+
+    def _flush_pending(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.create_task(self._resolve_pending(pending))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _resolve_pending(
+        self, pending: list[tuple[str, asyncio.Future[Embedding]]]
+    ) -> None:
+        try:
+            embeddings = await self._get_embeddings(
+                [query for query, _ in pending], self._timeout
+            )
+        except Exception as exc:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for (_, future), embedding in zip(pending, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
     async def generate_embeddings(self, queries: list[str]) -> list[Embedding]:
-        all_embeddings: list[Embedding] = []
+        keys = [self._cache_key(q) for q in queries]
+        all_embeddings: list[Embedding | None] = [self._cache_get(k) for k in keys]
+
+        # Only the misses go to the provider, duplicates within a call once
+        misses: dict[str, str] = {}
+        for key, query, embedding in zip(keys, queries, all_embeddings):
+            if embedding is None:
+                misses.setdefault(key, query)
+
+        computed: dict[str, Embedding] = {}
+        for key_batch in itertools.batched(misses, self._batch_size):
+            embedding_batch = await self._get_embeddings(
+                [misses[k] for k in key_batch], self._batch_timeout
+            )
+            for key, embedding in zip(key_batch, embedding_batch):
+                computed[key] = embedding
+                self._cache_put(key, embedding)
+
+        return [
+            e if e is not None else computed[k] for k, e in zip(keys, all_embeddings)
+        ]
+
+    def _cache_key(self, query: str) -> str:
+        return xxhash.xxh3_128_hexdigest(f"{self._model}\0{query}".encode("utf-8"))
 
-        for query_batch in itertools.batched(queries, self._batch_size):
-            embedding_batch = await self._get_embeddings(list(query_batch))
-            all_embeddings.extend(embedding_batch)
+    def _cache_get(self, key: str) -> Embedding | None:
+        vector = self._cache.get(key)
+        if vector is None:
+            return None
+        self._cache.move_to_end(key)
+        return vector.tolist()
 
-        return all_embeddings
+    def _cache_put(self, key: str, embedding: Embedding) -> None:
+        if self._cache_size <= 0:
+            return
+        self._cache[key] = array("d", embedding)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
@@ -1,14 +1,9 @@
 import asyncio
-import itertools
 
-from loguru import logger
-from openai import AsyncOpenAI, RateLimitError
-from tenacity import (
-    retry,
-    retry_if_exception_type,
-    stop_after_attempt,
-    wait_exponential,
-)
+import httpx
+from openai import AsyncOpenAI
+
+from .retry import openai_retry
 
 
 class ExplainerService:
@@ -20,18 +15,26 @@ class ExplainerService:
     _DEFAULT_EXPLANATION: str = "unknown"
 
     def __init__(
-        self, base_url: str, api_key: str, model: str, parallelism: int = 1
+        self,
+        base_url: str,
+        api_key: str,
+        model: str,
+        parallelism: int = 1,
+        http_client: httpx.AsyncClient | None = None,
     ) -> None:
-        self.openai = AsyncOpenAI(base_url=base_url, api_key=api_key)
+        self.openai = AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            http_client=http_client,
+            # Retries are owned by openai_retry, not stacked on the SDK's own
+            max_retries=0,
+        )
         self.parallelism = parallelism
         self.model = model
+        # Shared by every caller, a finished request immediately frees a slot
+        self._semaphore = asyncio.Semaphore(parallelism)
 
-    @retry(
-        wait=wait_exponential(min=5, max=20),
-        stop=stop_after_attempt(3),
-        retry=retry_if_exception_type(RateLimitError),
-        before_sleep=lambda x: logger.warning("Rate limit hit {} {}", x.fn, x.args),
-    )
+    @openai_retry
     async def _get_explanation(self, code_chunk: str) -> str:
         response = await self.openai.chat.completions.create(
             messages=[
@@ -53,20 +56,21 @@ class ExplainerService:
         return explanations
 
     async def _get_parallel_explanations(self, code_chunks: list[str]) -> list[str]:
-        batches = itertools.batched(code_chunks, self.parallelism)
-
-        explanations: list[str] = []
-
-        for batch in batches:
-            tasks = [
-                asyncio.create_task(self._get_explanation(chunk)) for chunk in batch
-            ]
-            results = await asyncio.gather(*tasks)
-            explanations.extend(results)
+        return await asyncio.gather(
+            *(self._get_bounded_explanation(chunk) for chunk in code_chunks)
+        )
 
-        return explanations
+    async def _get_bounded_explanation(self, code_chunk: str) -> str:
+        async with self._semaphore:
+            return await self._get_explanation(code_chunk)
 
     async def get_explanations(self, code_chunks: list[str]) -> list[str]:
+        # Identical chunks (boilerplate, re-exports) are explained once
+        unique_chunks = list(dict.fromkeys(code_chunks))
         if self.parallelism == 1:
-            return await self._get_sync_explanations(code_chunks)
-        return await self._get_parallel_explanations(code_chunks)
+            explanations = await self._get_sync_explanations(unique_chunks)
+        else:
+            explanations = await self._get_parallel_explanations(unique_chunks)
+
+        by_chunk = dict(zip(unique_chunks, explanations))
+        return [by_chunk[chunk] for chunk in code_chunks]
@@ -1,14 +1,35 @@
+import asyncio
 import inspect
-from collections.abc import Iterable, Mapping
+import itertools
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterable, Mapping
 from dataclasses import dataclass
+from functools import cached_property
 from typing import Any
 
+import xxhash
 from falkordb.asyncio import FalkorDB
 from falkordb.asyncio.graph import AsyncGraph
+from falkordb.asyncio.query_result import QueryResult
 from loguru import logger
 
 from core.graph import GraphEdge, GraphEdgeType
 
+# Bounds the UNWIND list the server materializes per write query
+WRITE_BATCH_SIZE = 2000
+# Column order of every node row, as unpacked by _row_to_node
+_NODE_FIELDS = (
+    "id",
+    "content",
+    "relative_path",
+    "start_line",
+    "end_line",
+    "language",
+    "doc",
+)
+# Bounds the node content held in memory per read query
+READ_PAGE_SIZE = 1000
+
 
 @dataclass(frozen=True)
 class GraphNode:
@@ -28,13 +49,25 @@ class GraphService:
         port: int = 6379,
         username: str | None = None,
         password: str | None = None,
+        max_connections: int = 32,
+        written_cache_size: int = 200_000,
     ) -> None:
         self._db = FalkorDB(
             host=host,
             port=port,
             username=username,
             password=password,
+            max_connections=max_connections,
         )
+        # The redis pool errors instead of waiting once it is exhausted, so
+        # concurrent queries queue here for a free connection
+        self._query_slots = asyncio.Semaphore(max_connections)
+        # (collection, node id) -> hash of the record last written, so
+        # re-adding unchanged nodes skips the MERGE entirely
+        self._written: OrderedDict[tuple[str, str], int] = OrderedDict()
+        self._written_cache_size = written_cache_size
+        # Graphs whose id index was already requested by this service
+        self._indexed: set[str] = set()
         self._node_label = "CodeChunk"
         self._relationship_pattern = "|".join(
             edge_type.value for edge_type in GraphEdgeType
@@ -46,7 +79,14 @@ class GraphService:
             self._node_label,
         )
 
+    async def aclose(self) -> None:
+        """Close the connection pool to FalkorDB."""
+        await self._db.aclose()
+
     async def delete_graph(self, collection_name: str) -> None:
+        for key in [key for key in self._written if key[0] == collection_name]:
+            del self._written[key]
+        self._indexed.discard(collection_name)
         graph = await self._graph(collection_name)
         logger.debug("Deleting FalkorDB graph %s", collection_name)
         delete_result = graph.delete()
@@ -59,55 +99,83 @@ class GraphService:
         nodes: Iterable[str | GraphNode | Mapping[str, Any]],
     ) -> None:
         records = self._normalize_node_records(nodes)
-        if not records:
+        changed = self._changed_records(collection_name, records)
+        if not changed:
             return
-        graph = await self._graph(collection_name)
-        logger.debug("Upserting %d nodes into %s", len(records), collection_name)
-        query = f"""
-            UNWIND $nodes AS node
-            MERGE (n:{self._node_label} {{id: node.id}})
-            SET n += node
-        """
-        await graph.query(query, params={"nodes": records})
+        logger.debug(
+            "Upserting {} of {} nodes into {}",
+            len(changed),
+            len(records),
+            collection_name,
+        )
+        await self._write_nodes(collection_name, changed)
 
     async def remove_nodes(self, collection_name: str, node_ids: Iterable[str]) -> None:
         ids = self._normalize_ids(node_ids)
         if not ids:
             return
+        for node_id in ids:
+            self._written.pop((collection_name, node_id), None)
         graph = await self._graph(collection_name)
         logger.debug("Removing %d nodes (detach) from %s", len(ids), collection_name)
+        # One IN filter instead of a seek planned per unwound id
         query = f"""
-            UNWIND $ids AS node_id
-            MATCH (n:{self._node_label} {{id: node_id}})
+            MATCH (n:{self._node_label})
+            WHERE n.id IN $ids
             DETACH DELETE n
         """
-        await graph.query(query, params={"ids": ids})
+        await self._query(graph, query, {"ids": ids})
 
     async def add_edges(self, collection_name: str, edges: Iterable[GraphEdge]) -> None:
-        typed_edges: dict[GraphEdgeType, list[dict[str, str]]] = {}
-        for edge in edges:
-            if not edge.source_id or not edge.target_id:
-                continue
-            typed_edges.setdefault(edge.edge_type, []).append(
-                {"source_id": edge.source_id, "target_id": edge.target_id}
-            )
-        if not typed_edges:
+        await self._write_edges(collection_name, self._group_edges(edges))
+
+    async def upsert_graph(
+        self,
+        collection_name: str,
+        nodes: Iterable[str | GraphNode | Mapping[str, Any]],
+        edges: Iterable[GraphEdge],
+    ) -> None:
+        """Writes nodes and then the edges between them.
+
+        When every part fits a single write batch the whole update is one
+        chained query, otherwise nodes and edges are written as by add_nodes
+        and add_edges.
+        """
+        records = self._normalize_node_records(nodes)
+        changed = self._changed_records(collection_name, records)
+        typed_edges = self._group_edges(edges)
+        if len(changed) > WRITE_BATCH_SIZE or any(
+            len(payload) > WRITE_BATCH_SIZE for payload in typed_edges.values()
+        ):
+            # Edges MATCH their endpoints, so nodes must land first
+            await self._write_nodes(collection_name, changed)
+            await self._write_edges(collection_name, typed_edges)
+            return
+
+        clauses: list[str] = []
+        params: dict[str, Any] = {}
+        if changed:
+            clauses.append(self._node_clause("nodes"))
+            params["nodes"] = [record for record, _ in changed]
+        for index, (edge_type, payload) in enumerate(typed_edges.items()):
+            # Aggregating restores a single row, so each UNWIND starts fresh
+            if clauses:
+                clauses.append(f"WITH count(*) AS written_{index}")
+            clauses.append(self._edge_clause(edge_type, f"edges_{index}"))
+            params[f"edges_{index}"] = payload
+        if not clauses:
             return
+
         graph = await self._graph(collection_name)
-        for edge_type, payload in typed_edges.items():
-            logger.debug(
-                "Upserting %d %s edges into %s",
-                len(payload),
-                edge_type.value,
-                collection_name,
-            )
-            query = f"""
-                UNWIND $edges AS edge
-                MATCH (source:{self._node_label} {{id: edge.source_id}})
-                MATCH (target:{self._node_label} {{id: edge.target_id}})
-                MERGE (source)-[:{edge_type.value}]->(target)
-            """
-            await graph.query(query, params={"edges": payload})
+        logger.debug(
+            "Upserting {} nodes and {} edges into {} in one query",
+            len(changed),
+            sum(len(payload) for payload in typed_edges.values()),
+            collection_name,
+        )
+        await self._ensure_id_index(graph, collection_name)
+        await self._query(graph, "\n".join(clauses), params)
+        self._remember_records(collection_name, changed)
 
     async def neighbors(
         self,
@@ -121,9 +189,33 @@ class GraphService:
         if max_hops < 1:
             raise ValueError("max_hops must be >= 1")
         graph = await self._graph(collection_name)
-        nodes = await self._neighbor_nodes(graph, ids, max_hops)
-        edges = await self._neighbor_edges(graph, ids, max_hops)
-        return nodes, edges
+
+        # Breadth-first, so server work follows the frontier instead of every
+        # variable-length path between the seeds and their neighborhood
+        nodes: dict[str, GraphNode] = {}
+        edges: dict[tuple[str, str, GraphEdgeType], GraphEdge] = {}
+        frontier = ids
+        expanded = set(ids)
+        for _ in range(max_hops):
+            node_rows, rel_rows = await self._neighbor_hop(graph, frontier, list(nodes))
+            for row in rel_rows:
+                edge = self._row_to_edge(row)
+                if edge is not None:
+                    edges.setdefault(
+                        (edge.source_id, edge.target_id, edge.edge_type), edge
+                    )
+            frontier = []
+            for row in node_rows:
+                graph_node = self._row_to_node(row)
+                if graph_node is None or graph_node.id in nodes:
+                    continue
+                nodes[graph_node.id] = graph_node
+                if graph_node.id not in expanded:
+                    frontier.append(graph_node.id)
+            expanded.update(frontier)
+            if not frontier:
+                break
+        return list(nodes.values()), list(edges.values())
 
     async def neighbor_nodes(
         self,
@@ -137,169 +229,267 @@ class GraphService:
     async def get_nodes(
         self, collection_name: str, node_ids: Iterable[str]
     ) -> list[GraphNode]:
+        return [node async for node in self.iter_nodes(collection_name, node_ids)]
+
+    async def iter_nodes(
+        self,
+        collection_name: str,
+        node_ids: Iterable[str],
+        page_size: int = READ_PAGE_SIZE,
+    ) -> AsyncIterator[GraphNode]:
         ids = self._normalize_ids(node_ids)
         if not ids:
-            return []
+            return
         graph = await self._graph(collection_name)
-        return await self._fetch_nodes(graph, ids)
+        async for node in self._fetch_nodes_stream(graph, ids, page_size):
+            yield node
 
     async def _graph(self, collection_name: str) -> AsyncGraph:
         return self._db.select_graph(collection_name)
 
-    async def _neighbor_nodes(
-        self, graph: AsyncGraph, node_ids: list[str], max_hops: int
-    ) -> list[GraphNode]:
-        seen: set[str] = set()
-        collected: list[GraphNode] = []
-        query = f"""
-            MATCH (start:{self._node_label})
-            WHERE start.id IN $ids
-            MATCH path = (start)-[:{self._relationship_pattern}*1..{max_hops}]-(neighbor)
-            UNWIND nodes(path) AS node
-            RETURN DISTINCT node.id AS node_id,
-                            node.content AS content,
-                            node.relative_path AS relative_path,
-                            node.start_line AS start_line,
-                            node.end_line AS end_line,
-                            node.language AS language,
-                            node.doc AS doc
+    async def _ensure_id_index(self, graph: AsyncGraph, collection_name: str) -> None:
+        # Every lookup matches on id, the index turns label scans into seeks
+        if collection_name in self._indexed:
+            return
+        self._indexed.add(collection_name)
+        try:
+            await self._query(
+                graph, f"CREATE INDEX FOR (n:{self._node_label}) ON (n.id)", {}
+            )
+        except Exception as e:
+            logger.debug("Id index not created for {}: {}", collection_name, e)
+
+    async def _query(
+        self, graph: AsyncGraph, query: str, params: dict[str, Any]
+    ) -> QueryResult:
+        async with self._query_slots:
+            return await graph.query(query, params=params)
+
+    async def _write_nodes(
+        self, collection_name: str, changed: list[tuple[dict[str, Any], int]]
+    ) -> None:
+        if not changed:
+            return
+        graph = await self._graph(collection_name)
+        await self._ensure_id_index(graph, collection_name)
+        query = self._node_clause("nodes")
+        await asyncio.gather(
+            *(
+                self._query(graph, query, {"nodes": [record for record, _ in batch]})
+                for batch in itertools.batched(changed, WRITE_BATCH_SIZE)
+            )
+        )
+        self._remember_records(collection_name, changed)
+
+    async def _write_edges(
+        self,
+        collection_name: str,
+        typed_edges: dict[GraphEdgeType, list[dict[str, str]]],
+    ) -> None:
+        if not typed_edges:
+            return
+        graph = await self._graph(collection_name)
+        # Edge types are independent MERGEs, dispatched together instead of
+        # paying one round-trip per type
+        queries = []
+        for edge_type, payload in typed_edges.items():
+            logger.debug(
+                "Upserting %d %s edges into %s",
+                len(payload),
+                edge_type.value,
+                collection_name,
+            )
+            query = self._edge_clause(edge_type, "edges")
+            queries.extend(
+                self._query(graph, query, {"edges": list(batch)})
+                for batch in itertools.batched(payload, WRITE_BATCH_SIZE)
+            )
+        await asyncio.gather(*queries)
+
+    @cached_property
+    def _neighbor_hop_query(self) -> str:
+        # One round-trip per hop: relationships touching the frontier plus the
+        # properties of nodes not returned by an earlier hop. Built once, so
+        # the server sees identical text and reuses its cached plan
+        return f"""
+            MATCH (n:{self._node_label})-[r:{self._relationship_pattern}]-(m:{self._node_label})
+            WHERE n.id IN $frontier
+            WITH collect(DISTINCT n) + collect(DISTINCT m) AS found,
+                 collect(DISTINCT [startNode(r).id, endNode(r).id, type(r)]) AS rels
+            RETURN [x IN found WHERE NOT x.id IN $seen |
+                       [{_node_columns("x")}]] AS nodes,
+                   rels
         """
-        result = await graph.query(query, params={"ids": node_ids})
-        for row in result.result_set:
-            graph_node = self._row_to_node(row)
-            if graph_node is None:
-                continue
-            if graph_node.id in seen:
-                continue
-            seen.add(graph_node.id)
-            collected.append(graph_node)
-        return collected
-
-    async def _neighbor_edges(
-        self, graph: AsyncGraph, node_ids: list[str], max_hops: int
-    ) -> list[GraphEdge]:
-        seen: set[tuple[str, str, GraphEdgeType]] = set()
-        collected: list[GraphEdge] = []
-        query = f"""
-            MATCH (start:{self._node_label})
-            WHERE start.id IN $ids
-            MATCH path = (start)-[:{self._relationship_pattern}*1..{max_hops}]-(neighbor)
-            UNWIND relationships(path) AS rel
-            RETURN DISTINCT startNode(rel).id AS source_id,
-                            endNode(rel).id AS target_id,
-                            type(rel) AS edge_type
+
+    @cached_property
+    def _fetch_nodes_query(self) -> str:
+        return f"""
+            MATCH (n:{self._node_label})
+            WHERE n.id IN $ids
+            RETURN {_node_columns("n")}
         """
-        result = await graph.query(query, params={"ids": node_ids})
-        for row in result.result_set:
-            if len(row) < 3:
-                continue
-            source_id, target_id, type_name = row
-            if not source_id or not target_id or not type_name:
-                continue
-            try:
-                edge_type = GraphEdgeType(str(type_name))
-            except ValueError:
-                logger.debug("Skipping unknown edge type %s", type_name)
-                continue
-            key = (str(source_id), str(target_id), edge_type)
-            if key in seen:
+
+    async def _neighbor_hop(
+        self, graph: AsyncGraph, frontier: list[str], seen: list[str]
+    ) -> tuple[list[list[Any]], list[list[Any]]]:
+        query = self._neighbor_hop_query
+        result = await self._query(graph, query, {"frontier": frontier, "seen": seen})
+        if not result.result_set:
+            return [], []
+        node_rows, rel_rows = result.result_set[0]
+        return node_rows or [], rel_rows or []
+
+    @staticmethod
+    def _row_to_edge(row: list[Any] | tuple[Any, ...]) -> GraphEdge | None:
+        if len(row) < 3:
+            return None
+        source_id, target_id, type_name = row[:3]
+        if not source_id or not target_id or not type_name:
+            return None
+        try:
+            edge_type = GraphEdgeType(str(type_name))
+        except ValueError:
+            logger.debug("Skipping unknown edge type %s", type_name)
+            return None
+        return GraphEdge(
+            source_id=str(source_id), target_id=str(target_id), edge_type=edge_type
+        )
+
+    def _node_clause(self, param: str) -> str:
+        return f"""
+            UNWIND ${param} AS node
+            MERGE (n:{self._node_label} {{id: node.id}})
+            SET n += node
+        """
+
+    def _edge_clause(self, edge_type: GraphEdgeType, param: str) -> str:
+        return f"""
+            UNWIND ${param} AS edge
+            MATCH (source:{self._node_label} {{id: edge.source_id}})
+            MATCH (target:{self._node_label} {{id: edge.target_id}})
+            MERGE (source)-[:{edge_type.value}]->(target)
+        """
+
+    @staticmethod
+    def _group_edges(
+        edges: Iterable[GraphEdge],
+    ) -> dict[GraphEdgeType, list[dict[str, str]]]:
+        typed_edges: dict[GraphEdgeType, list[dict[str, str]]] = {}
+        for edge in edges:
+            if not edge.source_id or not edge.target_id:
                 continue
-            seen.add(key)
-            collected.append(
-                GraphEdge(
-                    source_id=str(source_id),
-                    target_id=str(target_id),
-                    edge_type=edge_type,
-                )
+            typed_edges.setdefault(edge.edge_type, []).append(
+                {"source_id": edge.source_id, "target_id": edge.target_id}
             )
-        return collected
+        return typed_edges
+
+    def _changed_records(
+        self, collection_name: str, records: list[dict[str, Any]]
+    ) -> list[tuple[dict[str, Any], int]]:
+        changed = []
+        for record in records:
+            record_hash = self._record_hash(record)
+            if self._written.get((collection_name, record["id"])) != record_hash:
+                changed.append((record, record_hash))
+        return changed
+
+    def _remember_records(
+        self, collection_name: str, written: list[tuple[dict[str, Any], int]]
+    ) -> None:
+        for record, record_hash in written:
+            self._remember_written(collection_name, record["id"], record_hash)
+
+    def _remember_written(
+        self, collection_name: str, node_id: str, record_hash: int
+    ) -> None:
+        if self._written_cache_size <= 0:
+            return
+        key = (collection_name, node_id)
+        self._written[key] = record_hash
+        self._written.move_to_end(key)
+        while len(self._written) > self._written_cache_size:
+            self._written.popitem(last=False)
+
+    @staticmethod
+    def _record_hash(record: dict[str, Any]) -> int:
+        return xxhash.xxh3_128_intdigest(repr(sorted(record.items())).encode("utf-8"))
 
     @staticmethod
     def _normalize_ids(values: Iterable[str]) -> list[str]:
-        seen: set[str] = set()
-        for value in values:
-            if not value:
-                continue
-            if value in seen:
-                continue
-            seen.add(value)
-        return list(seen)
+        # First-seen order keeps the query parameters deterministic
+        return list(dict.fromkeys(value for value in values if value))
 
     @staticmethod
     def _normalize_node_records(
         nodes: Iterable[str | GraphNode | Mapping[str, Any]],
     ) -> list[dict[str, Any]]:
+        # Keyed by id, the last record for an id wins at its first position
         normalized: dict[str, dict[str, Any]] = {}
         for node in nodes:
-            record: dict[str, Any]
             if isinstance(node, GraphNode):
-                record = {
-                    "id": node.id,
-                    "content": node.content,
-                    "relative_path": (
-                        str(node.relative_path)
-                        if node.relative_path is not None
-                        else None
-                    ),
-                    "start_line": node.start_line,
-                    "end_line": node.end_line,
-                    "language": node.language,
-                    "doc": node.doc,
-                }
+                if node.id:
+                    normalized[node.id] = {
+                        "id": node.id,
+                        "content": node.content,
+                        "relative_path": (
+                            str(node.relative_path)
+                            if node.relative_path is not None
+                            else None
+                        ),
+                        "start_line": node.start_line,
+                        "end_line": node.end_line,
+                        "language": node.language,
+                        "doc": node.doc,
+                    }
             elif isinstance(node, str):
-                record = {"id": node}
+                if node:
+                    normalized[node] = {"id": node}
             elif isinstance(node, Mapping):
                 raw_id = node.get("id")
                 if not raw_id:
                     continue
                 record = dict(node)
-                record["id"] = str(raw_id)
+                record["id"] = node_id = str(raw_id)
                 relative_path = record.get("relative_path")
                 if relative_path is not None:
                     record["relative_path"] = str(relative_path)
-            else:
-                continue
-
-            node_id = record.get("id")
-            if not node_id:
-                continue
-            normalized[node_id] = record
+                normalized[node_id] = record
         return list(normalized.values())
 
     @staticmethod
     def _row_to_node(row: list[Any] | tuple[Any, ...] | None) -> GraphNode | None:
-        if not row:
+        # Every node query returns the _NODE_FIELDS columns
+        if row is None:
+            return None
+        try:
+            node_id, content, relative_path, start_line, end_line, language, doc = row
+        except (TypeError, ValueError):
             return None
-        node_id = row[0]
         if not node_id:
             return None
         return GraphNode(
             id=str(node_id),
-            content=str(row[1]) if len(row) > 1 and row[1] is not None else None,
-            relative_path=str(row[2]) if len(row) > 2 and row[2] is not None else None,
-            start_line=int(row[3]) if len(row) > 3 and row[3] is not None else None,
-            end_line=int(row[4]) if len(row) > 4 and row[4] is not None else None,
-            language=str(row[5]) if len(row) > 5 and row[5] is not None else None,
-            doc=str(row[6]) if len(row) > 6 and row[6] is not None else None,
+            content=None if content is None else str(content),
+            relative_path=None if relative_path is None else str(relative_path),
+            start_line=None if start_line is None else int(start_line),
+            end_line=None if end_line is None else int(end_line),
+            language=None if language is None else str(language),
+            doc=None if doc is None else str(doc),
         )
 
-    async def _fetch_nodes(self, graph, node_ids: list[str]) -> list[GraphNode]:
-        query = f"""
-            MATCH (n:{self._node_label})
-            WHERE n.id IN $ids
-            RETURN n.id AS node_id,
-                   n.content AS content,
-                   n.relative_path AS relative_path,
-                   n.start_line AS start_line,
-                   n.end_line AS end_line,
-                   n.language AS language,
-                   n.doc AS doc
-        """
-        result = await graph.query(query, params={"ids": node_ids})
-        nodes: list[GraphNode] = []
-        for row in result.result_set:
-            graph_node = self._row_to_node(row)
-            if graph_node is None:
-                continue
-            nodes.append(graph_node)
-        return nodes
+    async def _fetch_nodes_stream(
+        self, graph: AsyncGraph, node_ids: list[str], page_size: int
+    ) -> AsyncIterator[GraphNode]:
+        # Paged by id so only one page of node content is held at a time,
+        # without the unstable ordering and rescans of SKIP/LIMIT
+        query = self._fetch_nodes_query
+        for page in itertools.batched(node_ids, page_size):
+            result = await self._query(graph, query, {"ids": list(page)})
+            for row in result.result_set:
+                graph_node = self._row_to_node(row)
+                if graph_node is not None:
+                    yield graph_node
+
+
+def _node_columns(variable: str) -> str:
+    return ", ".join(f"{variable}.{field}" for field in _NODE_FIELDS)
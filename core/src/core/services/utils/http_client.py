@@ -0,0 +1,15 @@
+import httpx
+from openai import DefaultAsyncHttpxClient
+
+
+def make_http_client(
+    max_connections: int = 100, max_keepalive_connections: int = 50
+) -> httpx.AsyncClient:
+    """Connection pool meant to be shared by every OpenAI-compatible service."""
+    return DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        ),
+        http2=True,
+    )
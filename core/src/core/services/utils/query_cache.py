@@ -0,0 +1,113 @@
+import math
+import random
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+
+from .embedding_service import Embedding
+
+
+@dataclass(slots=True)
+class _CacheEntry[T]:
+    vector: Embedding
+    value: T
+    expires_at: float
+
+
+class SemanticQueryCache[T]:
+    """Approximate cache keyed by query embeddings.
+
+    Embeddings are bucketed by the signs of a few random projections. A lookup
+    probes the query bucket and every bucket one sign flip away, then returns
+    the freshest entry whose cosine similarity reaches the threshold.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        threshold: float = 0.95,
+        ttl: float = 60.0,
+        max_buckets: int = 256,
+        bucket_size: int = 8,
+        planes: int = 8,
+        seed: int = 0,
+    ) -> None:
+        rng = random.Random(seed)
+        self._planes = [
+            [rng.gauss(0.0, 1.0) for _ in range(size)] for _ in range(planes)
+        ]
+        self._threshold = threshold
+        self._ttl = ttl
+        self._max_buckets = max_buckets
+        self._bucket_size = bucket_size
+        self._buckets: OrderedDict[tuple[Hashable, int], list[_CacheEntry[T]]] = (
+            OrderedDict()
+        )
+
+    def get(self, scope: Hashable, embedding: Embedding) -> T | None:
+        if self._ttl <= 0:
+            return None
+        vector = self._normalize(embedding)
+        signature = self._signature(vector)
+        now = time.monotonic()
+
+        best: _CacheEntry[T] | None = None
+        best_key: tuple[Hashable, int] | None = None
+        best_score = self._threshold
+        for probe in self._probes(signature):
+            key = (scope, probe)
+            entries = self._buckets.get(key)
+            if not entries:
+                continue
+            entries[:] = [e for e in entries if e.expires_at > now]
+            if not entries:
+                del self._buckets[key]
+                continue
+            for entry in entries:
+                score = math.sumprod(vector, entry.vector)
+                if score >= best_score:
+                    best, best_key, best_score = entry, key, score
+
+        if best is None or best_key is None:
+            return None
+        self._buckets.move_to_end(best_key, last=True)
+        return best.value
+
+    def put(self, scope: Hashable, embedding: Embedding, value: T) -> None:
+        if self._ttl <= 0:
+            return
+        vector = self._normalize(embedding)
+        key = (scope, self._signature(vector))
+        entries = self._buckets.setdefault(key, [])
+        entries.append(
+            _CacheEntry(
+                vector=vector, value=value, expires_at=time.monotonic() + self._ttl
+            )
+        )
+        del entries[: -self._bucket_size]
+        self._buckets.move_to_end(key, last=True)
+        while len(self._buckets) > self._max_buckets:
+            self._buckets.popitem(last=False)
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+    def _signature(self, vector: Embedding) -> int:
+        signature = 0
+        for bit, plane in enumerate(self._planes):
+            if math.sumprod(vector, plane) >= 0.0:
+                signature |= 1 << bit
+        return signature
+
+    def _probes(self, signature: int) -> list[int]:
+        return [signature] + [
+            signature ^ (1 << bit) for bit in range(len(self._planes))
+        ]
+
+    @staticmethod
+    def _normalize(embedding: Embedding) -> Embedding:
+        norm = math.sqrt(math.sumprod(embedding, embedding))
+        if norm == 0.0:
+            return list(embedding)
+        return [value / norm for value in embedding]
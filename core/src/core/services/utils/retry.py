@@ -0,0 +1,30 @@
+from loguru import logger
+from openai import APIConnectionError, APIStatusError
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+
+def _is_transient(exc: BaseException) -> bool:
+    # Same statuses the SDK retries itself, timeouts are connection errors
+    if isinstance(exc, APIConnectionError):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in (408, 409, 429) or exc.status_code >= 500
+    return False
+
+
+# Transient provider failures, retried quickly with jitter so interactive
+# searches recover in well under a second from a single blip
+openai_retry = retry(
+    wait=wait_random_exponential(multiplier=0.5, max=20),
+    stop=stop_after_attempt(5),
+    retry=retry_if_exception(_is_transient),
+    before_sleep=lambda x: logger.warning(
+        "Transient provider error {} {}", x.fn, x.outcome and x.outcome.exception()
+    ),
+    reraise=True,
+)
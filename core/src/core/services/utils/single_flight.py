@@ -0,0 +1,28 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+
+
+class SingleFlight[K: Hashable, V]:
+    """Collapses concurrent calls sharing a key into one execution.
+
+    Callers arriving while a call is in flight await the same future. The
+    future is shielded so a cancelled caller does not cancel it for the rest.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: dict[K, asyncio.Future[V]] = {}
+
+    async def run(self, key: K, fn: Callable[[], Awaitable[V]]) -> V:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(future)
+
+    def _forget(self, key: K, future: asyncio.Future[V]) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            # Mark the exception retrieved when every caller went away
+            future.exception()
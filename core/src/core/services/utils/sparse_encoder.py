@@ -0,0 +1,35 @@
+import asyncio
+import threading
+from functools import lru_cache
+
+from fastembed import SparseTextEmbedding
+from qdrant_client import models
+
+
+class SparseQueryEncoder:
+    """Encodes search queries into sparse vectors on the client.
+
+    Mirrors what qdrant-client does for a query-side `models.Document`, but
+    runs once per distinct query so several sparse prefetches can share it.
+    """
+
+    def __init__(self, model_name: str, cache_size: int = 1024) -> None:
+        self._model_name = model_name
+        self._model: SparseTextEmbedding | None = None
+        self._lock = threading.Lock()
+        self._encode = lru_cache(maxsize=cache_size)(self._encode_uncached)
+
+    async def encode(self, query: str) -> models.SparseVector:
+        return await asyncio.to_thread(self._encode, query)
+
+    def _encode_uncached(self, query: str) -> models.SparseVector:
+        embedding = next(iter(self._get_model().query_embed(query)))
+        return models.SparseVector(
+            indices=embedding.indices.tolist(), values=embedding.values.tolist()
+        )
+
+    def _get_model(self) -> SparseTextEmbedding:
+        with self._lock:
+            if self._model is None:
+                self._model = SparseTextEmbedding(self._model_name)
+            return self._model
@@ -1,7 +1,11 @@
+import asyncio
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Sequence
 from pathlib import Path
 from typing import Protocol
 
+from loguru import logger
+
 from .types import CodeChunk
 
 
@@ -20,6 +24,31 @@ class Splitter(Protocol):
         """
         ...
 
+    def iter_split(self, code: str, file_path: Path) -> AsyncIterator[CodeChunk]:
+        """Split code into chunks, yielding them as they are produced.
+
+        Args:
+            code: Code content to split
+            file_path: Path to the file
+
+        Yields:
+            Code chunks
+        """
+        ...
+
+    async def split_many(
+        self, items: Sequence[tuple[str, Path]]
+    ) -> list[list[CodeChunk]]:
+        """Split several files concurrently.
+
+        Args:
+            items: Pairs of code content and file path
+
+        Returns:
+            Chunks of each file, in input order
+        """
+        ...
+
     def set_chunk_size(self, chunk_size: int) -> None:
         """Set chunk size.
 
@@ -57,6 +86,48 @@ class BaseSplitter(ABC):
         """
         ...
 
+    async def iter_split(self, code: str, file_path: Path) -> AsyncIterator[CodeChunk]:
+        """Split code into chunks, yielding them as they are produced.
+
+        Args:
+            code: Code content to split
+            file_path: Path to the file
+
+        Yields:
+            Code chunks
+        """
+        for chunk in await self.split(code, file_path):
+            yield chunk
+
+    async def split_many(
+        self, items: Sequence[tuple[str, Path]]
+    ) -> list[list[CodeChunk]]:
+        """Split several files concurrently.
+
+        A file that fails to split contributes no chunks instead of failing
+        the whole call.
+
+        Args:
+            items: Pairs of code content and file path
+
+        Returns:
+            Chunks of each file, in input order
+        """
+        results = await asyncio.gather(
+            *(self.split(code, file_path) for code, file_path in items),
+            return_exceptions=True,
+        )
+        split_chunks: list[list[CodeChunk]] = []
+        for (_, file_path), result in zip(items, results):
+            if isinstance(result, Exception):
+                logger.debug("Unable to split a file {} {}", file_path, result)
+                split_chunks.append([])
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                split_chunks.append(result)
+        return split_chunks
+
     def set_chunk_size(self, chunk_size: int) -> None:
         """Set chunk size.
 
@@ -1,3 +1,4 @@
+from collections.abc import Iterable
 from pathlib import Path
 
 import xxhash
@@ -32,3 +33,23 @@ def make_chunk_id_from_components(
         )
     )
     return xxhash.xxh3_128_hexdigest(payload.encode("utf-8"))
+
+
+def make_chunk_ids_from_components(
+    file_path: Path,
+    node_type: str,
+    parent_id: str | None,
+    identifiers: Iterable[str],
+) -> list[str]:
+    """Ids of sibling chunks, one per identifier.
+
+    Equal to calling make_chunk_id_from_components for each identifier, with
+    the path normalization and shared payload prefix done once.
+    """
+    prefix = _COMPONENT_SEPARATOR.join(
+        (_normalize_file_path(file_path), node_type, parent_id or "", "")
+    )
+    return [
+        xxhash.xxh3_128_hexdigest(f"{prefix}{identifier}".encode("utf-8"))
+        for identifier in identifiers
+    ]
@@ -1,37 +1,47 @@
+import asyncio
+import itertools
+import re
+import threading
 from collections import defaultdict
+from collections.abc import AsyncIterator, Iterator
+from functools import lru_cache
 from pathlib import Path
 
 from loguru import logger
-from tree_sitter import Node, Parser
-from tree_sitter_language_pack import SupportedLanguage, get_parser
+from tree_sitter import Language, Node, Parser
+from tree_sitter_language_pack import SupportedLanguage, get_language
 
 from .base import BaseSplitter
-from .ids import make_chunk_id_from_components
+from .ids import make_chunk_id_from_components, make_chunk_ids_from_components
 from .types import CodeChunk
 from .utils import _LANGUAGE_EXTENSIONS, SPLITTABLE_NODE_TYPES
 
 # Body-node candidates across supported grammars.
-_BODY_NODE_TYPES = {
-    "block",  # java / csharp / rust / go / many C-like bodies
-    "suite",  # python
-    "statement_block",  # js / ts
-    "compound_statement",  # c / cpp
-}
+_BODY_NODE_TYPES = frozenset(
+    {
+        "block",  # java / csharp / rust / go / many C-like bodies
+        "suite",  # python
+        "statement_block",  # js / ts
+        "compound_statement",  # c / cpp
+    }
+)
 
 # String literal node names commonly used across grammars.
-_STRING_NODE_TYPES = {
-    "string",  # js / py (container)
-    "string_literal",  # java / c / cpp / csharp / rust / scala / kotlin / swift
-    "interpreted_string_literal",  # go
-    "raw_string_literal",  # go
-    "string_fragment",  # appears within string nodes in some grammars
-}
+_STRING_NODE_TYPES = frozenset(
+    {
+        "string",  # js / py (container)
+        "string_literal",  # java / c / cpp / csharp / rust / scala / kotlin / swift
+        "interpreted_string_literal",  # go
+        "raw_string_literal",  # go
+        "string_fragment",  # appears within string nodes in some grammars
+    }
+)
 
 # Comment node names across grammars.
-_COMMENT_NODE_TYPES = {"comment", "line_comment", "block_comment"}
+_COMMENT_NODE_TYPES = frozenset({"comment", "line_comment", "block_comment"})
 
 # Languages where an inline string as the first statement *inside* the body is a docstring.
-_INLINE_DOCSTRING_LANGS = {"python"}
+_INLINE_DOCSTRING_LANGS = frozenset({"python"})
 
 # Doc-comment prefixes that usually indicate documentation-style comments.
 _DOC_COMMENT_PREFIXES = (
@@ -42,6 +52,41 @@ _DOC_COMMENT_PREFIXES = (
     "##",  # sometimes used as doc in scripts
 )
 
+# _DOC_COMMENT_PREFIXES keyed by first character, so most lines are rejected
+# on a single lookup
+_DOC_PREFIXES_BY_HEAD: dict[str, tuple[str, ...]] = {
+    head: tuple(p for p in _DOC_COMMENT_PREFIXES if p[0] == head)
+    for head in dict.fromkeys(p[0] for p in _DOC_COMMENT_PREFIXES)
+}
+
+# Longest prefix first, matching how doc comment lines are written
+_DOC_LINE_PREFIX = re.compile(r"^(?:///|//!|//|\*|##|#)")
+_DOC_BLOCK_OPENER = re.compile(r"^/\*[*!]?")
+
+# Chunks handed from the worker thread to iter_split per step
+STREAM_BATCH_SIZE = 64
+
+
+class _ThreadParsers(threading.local):
+    # A parser carries state between parses, so each thread keeps its own
+    def __init__(self) -> None:
+        self.parsers: dict[SupportedLanguage, Parser] = {}
+
+
+_thread_parsers = _ThreadParsers()
+
+
+@lru_cache(maxsize=None)
+def _load_language(lang: SupportedLanguage) -> Language | None:
+    # Loaded once per process and shared by every splitter and thread
+    try:
+        language = get_language(lang)
+    except Exception as e:
+        logger.warning(f"Failed to load tree-sitter parser for {lang}: {e}")
+        return None
+    logger.debug(f"Loaded tree-sitter parser for {lang}")
+    return language
+
 
 class TreeSitterSplitter(BaseSplitter):
 
@@ -52,7 +97,6 @@ class TreeSitterSplitter(BaseSplitter):
         extract_docs: bool = False,
     ) -> None:
         super().__init__(chunk_size, chunk_overlap)
-        self._parsers: dict[SupportedLanguage, Parser] = {}
         self.extract_docs = extract_docs
 
     # ----------------------- Public API -----------------------
@@ -73,23 +117,79 @@ class TreeSitterSplitter(BaseSplitter):
             logger.debug(f"File type not supported by Tree-Sitter: {file_path.suffix}")
             return await self._fallback_text_split(code, file_path)
 
-        parser = self._get_parser(lang)
-        if not parser:
+        # Everything is collected before returning, so a failure part way
+        # through still sends the whole file to the fallback
+        chunks: list[CodeChunk] = []
+        try:
+            batches = self._split_batches(code, file_path, lang)
+            while batch := await asyncio.to_thread(next, batches, None):
+                chunks.extend(batch)
+        except Exception as e:
+            logger.warning(f"Tree-Sitter failed for {file_path.name}: {e}")
             return await self._fallback_text_split(code, file_path)
 
-        try:
-            tree = parser.parse(code.encode("utf-8"))
-            if not tree or not tree.root_node:
-                logger.warning(f"Failed to parse AST for {file_path.name}")
-                return await self._fallback_text_split(code, file_path)
+        return chunks or await self._fallback_text_split(code, file_path)
+
+    async def iter_split(self, code: str, file_path: Path) -> AsyncIterator[CodeChunk]:
+        """
+        Split file content like `split`, yielding chunks while the tree is walked.
+
+        Unlike `split`, a failure after chunks were yielded does not fall back to
+        text splitting for the whole file.
+
+        Args:
+            code: File content
+            file_path: Path to the file
 
-            chunks = self._extract_chunks(tree.root_node, lang, code, file_path)
-            refined_chunks = await self._refine_chunks(chunks)
-            return refined_chunks
+        Yields:
+            CodeChunk
+        """
+        lang = _LANGUAGE_EXTENSIONS.get(file_path.suffix.lower().strip())
+        if lang is None:
+            logger.debug(f"File type not supported by Tree-Sitter: {file_path.suffix}")
+            for chunk in await self._fallback_text_split(code, file_path):
+                yield chunk
+            return
 
+        emitted = False
+        try:
+            batches = self._split_batches(code, file_path, lang)
+            # Parsing, the tree walk and refinement are CPU-bound, each batch
+            # is produced in a worker thread so the loop keeps serving others
+            while batch := await asyncio.to_thread(next, batches, None):
+                emitted = True
+                for chunk in batch:
+                    yield chunk
         except Exception as e:
             logger.warning(f"Tree-Sitter failed for {file_path.name}: {e}")
-            return await self._fallback_text_split(code, file_path)
+
+        # Chunks already handed out can't be taken back, the fallback only
+        # replaces a file that produced nothing
+        if not emitted:
+            for chunk in await self._fallback_text_split(code, file_path):
+                yield chunk
+
+    def _split_batches(
+        self, code: str, file_path: Path, lang: SupportedLanguage
+    ) -> Iterator[list[CodeChunk]]:
+        # Parses on the first step, so the parser is looked up in that thread
+        parser = self._get_parser(lang)
+        if not parser:
+            return
+
+        # Encoded once, node byte offsets index straight into it
+        source = code.encode("utf-8")
+        tree = parser.parse(source)
+        if not tree or not tree.root_node:
+            logger.warning(f"Failed to parse AST for {file_path.name}")
+            return
+
+        chunks = self._extract_chunks(
+            tree.root_node, lang, code, memoryview(source), file_path
+        )
+        refined = (sub for chunk in chunks for sub in self._refine_chunk(chunk))
+        for batch in itertools.batched(refined, STREAM_BATCH_SIZE):
+            yield list(batch)
 
     # ----------------------- Core traversal -----------------------
 
@@ -98,9 +198,9 @@ class TreeSitterSplitter(BaseSplitter):
         node: Node,
         lang: SupportedLanguage,
         code: str,
+        source: memoryview,
         file_path: Path,
-    ) -> list[CodeChunk]:
-        chunks: list[CodeChunk] = []
+    ) -> Iterator[CodeChunk]:
         splittable_types = SPLITTABLE_NODE_TYPES.get(lang)
 
         if not splittable_types:
@@ -120,15 +220,28 @@ class TreeSitterSplitter(BaseSplitter):
                 return base if occurrence == 0 else f"{base}#{occurrence}"
             return f"{base}@{occurrence}"
 
-        def traverse(current_node: Node, parent_chunk_id: str | None = None) -> None:
+        # Without docs a chunk is just its node's text, sliced inline
+        extract_docs = self.extract_docs
+        emitted = False
+        # scopes[depth] is the enclosing chunk id for nodes at that depth
+        scopes: list[str | None] = [None]
+        for current_node, depth in _walk(node):
+            del scopes[depth + 1 :]
+            parent_chunk_id = scopes[depth]
+            chunk_id = None
             if current_node.type in splittable_types:
-                start_line = current_node.start_point[0] + 1
-                end_line = current_node.end_point[0] + 1
-
-                content, doc = self._node_code_and_doc(current_node, lang, code)
-
-                if content and content.strip():
-                    identifier = self._node_identifier(current_node, code)
+                if extract_docs:
+                    content, doc = self._node_code_and_doc(current_node, lang, source)
+                else:
+                    content = str(
+                        source[current_node.start_byte : current_node.end_byte],
+                        "utf-8",
+                        "replace",
+                    )
+                    doc = None
+                content = content.strip()
+                if content:
+                    identifier = self._node_identifier(current_node, source)
                     resolved_identifier = next_identifier(
                         parent_chunk_id, current_node.type, identifier
                     )
@@ -138,30 +251,21 @@ class TreeSitterSplitter(BaseSplitter):
                         parent_chunk_id,
                         resolved_identifier,
                     )
-                    chunks.append(
-                        CodeChunk(
-                            id=chunk_id,
-                            content=content.strip(),
-                            start_line=start_line,
-                            end_line=end_line,
-                            language=lang,
-                            file_path=file_path,
-                            doc=doc.strip() if doc is not None else None,
-                            node=current_node,
-                            parent_chunk_id=parent_chunk_id,
-                        )
+                    emitted = True
+                    yield CodeChunk(
+                        id=chunk_id,
+                        content=content,
+                        start_line=current_node.start_point[0] + 1,
+                        end_line=current_node.end_point[0] + 1,
+                        language=lang,
+                        file_path=file_path,
+                        doc=doc,
+                        node=current_node,
+                        parent_chunk_id=parent_chunk_id,
                     )
-                else:
-                    chunk_id = None
-            else:
-                chunk_id = None
-
-            for child in current_node.children:
-                traverse(child, chunk_id or parent_chunk_id)
+            scopes.append(chunk_id or parent_chunk_id)
 
-        traverse(node)
-
-        if not chunks:
+        if not emitted:
             total_lines = len(code.splitlines()) or 1
             chunk_id = make_chunk_id_from_components(
                 file_path,
@@ -169,59 +273,51 @@ class TreeSitterSplitter(BaseSplitter):
                 None,
                 "fallback-root",
             )
-            chunks.append(
-                CodeChunk(
-                    id=chunk_id,
-                    content=code.strip(),
-                    start_line=1,
-                    end_line=total_lines,
-                    language=lang,
-                    file_path=file_path,
-                    doc=None,
-                    node=None,
-                    parent_chunk_id=None,
-                )
+            yield CodeChunk(
+                id=chunk_id,
+                content=code.strip(),
+                start_line=1,
+                end_line=total_lines,
+                language=lang,
+                file_path=file_path,
+                doc=None,
+                node=None,
+                parent_chunk_id=None,
             )
 
-        return chunks
-
     # ----------------------- Parser helpers -----------------------
 
     def _get_parser(self, lang: SupportedLanguage) -> Parser | None:
-        if lang in self._parsers:
-            return self._parsers[lang]
-        try:
-            parser = get_parser(lang)
-            self._parsers[lang] = parser
-            logger.debug(f"Loaded tree-sitter parser for {lang}")
-            return parser
-        except Exception as e:
-            logger.warning(f"Failed to load tree-sitter parser for {lang}: {e}")
-            return None
+        parser = _thread_parsers.parsers.get(lang)
+        if parser is None:
+            language = _load_language(lang)
+            if language is None:
+                return None
+            parser = _thread_parsers.parsers[lang] = Parser(language)
+        return parser
 
     # ----------------------- Byte slicing -----------------------
 
-    def _slice(self, code: str, start: int, end: int) -> str:
-        return code.encode("utf-8")[start:end].decode("utf-8")
+    def _slice(self, source: memoryview, start: int, end: int) -> str:
+        # Decodes straight from the shared buffer, no intermediate bytes copy
+        return str(source[start:end], "utf-8", "replace")
 
     # ----------------------- Doc extraction core -----------------------
 
     def _node_code_and_doc(
-        self, node: Node, lang: SupportedLanguage, code: str
+        self, node: Node, lang: SupportedLanguage, source: memoryview
     ) -> tuple[str, str | None]:
-        node_text = self._slice(code, node.start_byte, node.end_byte)
-        if not self.extract_docs:
-            return node_text, None
+        node_text = self._slice(source, node.start_byte, node.end_byte)
 
         inline_doc: str | None = None
         code_wo_inline: str = node_text
 
         # 1) Inline docstring inside the node (Python).
         if lang in _INLINE_DOCSTRING_LANGS:
-            inline_doc, code_wo_inline = self._extract_inline_docstring(node, code)
+            inline_doc, code_wo_inline = self._extract_inline_docstring(node, source)
 
         # 2) Leading documentation comments outside the node (all languages).
-        leading_doc = self._gather_leading_doc_comment_block(node, code)
+        leading_doc = self._gather_leading_doc_comment_block(node, source)
 
         # Prefer inline doc if present; otherwise take leading doc if present.
         if inline_doc:
@@ -231,12 +327,14 @@ class TreeSitterSplitter(BaseSplitter):
 
         return node_text, None
 
-    def _node_identifier(self, node: Node, code: str) -> str | None:
+    def _node_identifier(self, node: Node, source: memoryview) -> str | None:
         for field in ("name", "identifier", "declarator"):
             field_node = node.child_by_field_name(field)
             if field_node is None:
                 continue
-            text = self._slice(code, field_node.start_byte, field_node.end_byte).strip()
+            text = self._slice(
+                source, field_node.start_byte, field_node.end_byte
+            ).strip()
             if text:
                 return text
 
@@ -244,7 +342,7 @@ class TreeSitterSplitter(BaseSplitter):
         if identifier_node is None:
             return None
         text = self._slice(
-            code, identifier_node.start_byte, identifier_node.end_byte
+            source, identifier_node.start_byte, identifier_node.end_byte
         ).strip()
         return text or None
 
@@ -258,23 +356,24 @@ class TreeSitterSplitter(BaseSplitter):
         return None
 
     def _extract_inline_docstring(
-        self, node: Node, code: str
+        self, node: Node, source: memoryview
     ) -> tuple[str | None, str]:
-        full = self._slice(code, node.start_byte, node.end_byte)
+        full = self._slice(source, node.start_byte, node.end_byte)
         body = self._find_body_child(node)
-        if not body or not body.named_children:
+        # named_child(0) reads one child instead of building the whole list
+        first_stmt = body.named_child(0) if body else None
+        if first_stmt is None:
             return None, full
 
-        first_stmt = body.named_children[0]
         # Pattern: expression_statement -> (string|string_literal|...)
-        if first_stmt.type == "expression_statement" and first_stmt.named_children:
-            str_node = first_stmt.named_children[0]
-            if str_node.type in _STRING_NODE_TYPES:
-                raw_doc = self._slice(code, str_node.start_byte, str_node.end_byte)
+        if first_stmt.type == "expression_statement":
+            str_node = first_stmt.named_child(0)
+            if str_node is not None and str_node.type in _STRING_NODE_TYPES:
+                raw_doc = self._slice(source, str_node.start_byte, str_node.end_byte)
                 doc_text = self._unquote_string_literal(raw_doc)
 
-                before = self._slice(code, node.start_byte, first_stmt.start_byte)
-                after = self._slice(code, first_stmt.end_byte, node.end_byte)
+                before = self._slice(source, node.start_byte, first_stmt.start_byte)
+                after = self._slice(source, first_stmt.end_byte, node.end_byte)
                 new_full = (before + after).strip()
                 return doc_text, (new_full if new_full else full)
 
@@ -294,49 +393,44 @@ class TreeSitterSplitter(BaseSplitter):
         prefix = s[:i]
         body = s[i:]
 
-        # Triple quotes
-        for q in ('"""', "'''"):
-            if body.startswith(q) and body.endswith(q) and len(body) >= 2 * len(q):
-                return body[len(q) : -len(q)]
-
-        # Single/double quotes
-        for q in ('"', "'"):
-            if body.startswith(q) and body.endswith(q) and len(body) >= 2:
+        # The first character decides the quote style
+        quote = body[:1]
+        if quote in ('"', "'"):
+            triple = quote * 3
+            if len(body) >= 6 and body[:3] == triple and body[-3:] == triple:
+                return body[3:-3]
+            if len(body) >= 2 and body[-1] == quote:
                 return body[1:-1]
 
         # If prefixes ended up consuming entire string or malformed quotes, just return original
         return s[len(prefix) :] if prefix and len(prefix) < len(s) else s
 
-    def _gather_leading_doc_comment_block(self, node: Node, code: str) -> str | None:
-        prev = node.prev_sibling
-        if prev is None:
-            return None
-
+    def _gather_leading_doc_comment_block(
+        self, node: Node, source: memoryview
+    ) -> str | None:
+        # Decided per comment while walking, the block is joined only if kept
         comments: list[str] = []
-
+        has_doc_prefix = False
+        line_comments = 0
+        prev = node.prev_sibling
         while prev and prev.type in _COMMENT_NODE_TYPES:
-            comments.append(self._slice(code, prev.start_byte, prev.end_byte))
+            text = self._slice(source, prev.start_byte, prev.end_byte)
+            comments.append(text)
+            for ln in text.splitlines():
+                ln = ln.lstrip()
+                head = ln[:1]
+                if head in _DOC_PREFIXES_BY_HEAD and ln.startswith(
+                    _DOC_PREFIXES_BY_HEAD[head]
+                ):
+                    has_doc_prefix = True
+                elif head == "#" or ln.startswith("//"):
+                    line_comments += 1
             prev = prev.prev_sibling
 
-        if not comments:
+        if not has_doc_prefix and line_comments < 2:
             return None
 
-        comments.reverse()
-        block = "\n".join(comments).strip()
-        if not block:
-            return None
-
-        lines = [ln.lstrip() for ln in block.splitlines()]
-        has_doc_prefix = any(ln.startswith(_DOC_COMMENT_PREFIXES) for ln in lines)
-
-        if not has_doc_prefix:
-            consecutive = sum(
-                1 for ln in lines if ln.startswith("//") or ln.startswith("#")
-            )
-            if consecutive < 2:
-                return None
-
-        return block
+        return "\n".join(reversed(comments)).strip() or None
 
     def _find_body_child(self, node: Node) -> Node | None:
         for ch in node.named_children:
@@ -355,10 +449,10 @@ class TreeSitterSplitter(BaseSplitter):
             s = raw.strip()
 
             # Start of block comment
-            if s.startswith("/**") or s.startswith("/*!") or s.startswith("/*"):
+            if s.startswith("/*"):
                 in_block = True
                 # Drop the opener itself; keep any content after it.
-                s = s[3:].lstrip("!*").strip()
+                s = _DOC_BLOCK_OPENER.sub("", s, count=1).lstrip("!*").strip()
                 if not s:
                     continue
 
@@ -370,86 +464,32 @@ class TreeSitterSplitter(BaseSplitter):
                     continue
 
             # Strip common line prefixes
-            if s.startswith("///") or s.startswith("//!") or s.startswith("//"):
-                if s.startswith("///"):
-                    s = s[3:].lstrip()
-                elif s.startswith("//!"):
-                    s = s[3:].lstrip()
-                else:
-                    s = s[2:].lstrip()
-            elif s.startswith("*"):
-                s = s[1:].lstrip()
-            elif s.startswith("##"):
-                s = s[2:].lstrip()
-            elif s.startswith("#"):
-                s = s[1:].lstrip()
-
-            out.append(s)
+            out.append(_DOC_LINE_PREFIX.sub("", s, count=1).lstrip())
 
         cleaned = "\n".join(out).strip()
-        return cleaned or text
+        return cleaned or text.strip()
 
     # ----------------------- Refinement & fallback -----------------------
 
-    async def _refine_chunks(self, chunks: list[CodeChunk]) -> list[CodeChunk]:
-        refined: list[CodeChunk] = []
-
-        for chunk in chunks:
-            if len(chunk.content) <= self.chunk_size:
-                refined.append(chunk)
-            else:
-                subs = self._split_large_chunk(chunk)
-                subs = self._add_overlap(subs)
-                refined.extend(subs)
-
-        return refined
+    def _refine_chunk(self, chunk: CodeChunk) -> list[CodeChunk]:
+        if len(chunk.content) <= self.chunk_size:
+            return [chunk]
+        return self._add_overlap(self._split_large_chunk(chunk))
 
     def _split_large_chunk(self, chunk: CodeChunk) -> list[CodeChunk]:
-        lines = chunk.content.split("\n")
+        content = chunk.content
+        windows = list(self._line_windows(content))
+        part_ids = self._make_sub_chunk_ids(chunk, len(windows))
         sub_chunks: list[CodeChunk] = []
 
-        current_chunk = ""
-        current_start_line = chunk.start_line
-        current_line_count = 0
-        part_index = 0
-
-        for i, line in enumerate(lines):
-            line_with_newline = line + ("\n" if i < len(lines) - 1 else "")
-
-            if (
-                len(current_chunk) + len(line_with_newline) > self.chunk_size
-                and current_chunk.strip()
-            ):
-                part_id = self._make_sub_chunk_id(chunk, part_index)
-                part_index += 1
-                sub_chunks.append(
-                    CodeChunk(
-                        id=part_id,
-                        content=current_chunk.strip(),
-                        start_line=current_start_line,
-                        end_line=current_start_line + current_line_count - 1,
-                        language=chunk.language,
-                        file_path=chunk.file_path,
-                        doc=chunk.doc,
-                        node=chunk.node,
-                        parent_chunk_id=chunk.parent_chunk_id,
-                    )
-                )
-                current_chunk = line_with_newline
-                current_start_line = chunk.start_line + i
-                current_line_count = 1
-            else:
-                current_chunk += line_with_newline
-                current_line_count += 1
-
-        if current_chunk.strip():
-            part_id = self._make_sub_chunk_id(chunk, part_index)
+        for part_id, (start, end, first_line, line_count) in zip(part_ids, windows):
+            start_line = chunk.start_line + first_line
             sub_chunks.append(
                 CodeChunk(
                     id=part_id,
-                    content=current_chunk.strip(),
-                    start_line=current_start_line,
-                    end_line=current_start_line + current_line_count - 1,
+                    content=content[start:end].strip(),
+                    start_line=start_line,
+                    end_line=start_line + line_count - 1,
                     language=chunk.language,
                     file_path=chunk.file_path,
                     doc=chunk.doc,
@@ -460,21 +500,42 @@ class TreeSitterSplitter(BaseSplitter):
 
         return sub_chunks
 
+    def _line_windows(self, text: str) -> Iterator[tuple[int, int, int, int]]:
+        """Greedily packs whole lines into windows of at most chunk_size.
+
+        Yields (start, end) character offsets, the index of the first line and
+        the line count. A window only closes once it holds non-blank text, and
+        a single line longer than chunk_size gets a window of its own.
+        """
+        size = len(text)
+        start = offset = first_line = 0
+        has_text = False
+        lines = text.split("\n")
+        for i, line in enumerate(lines):
+            line_end = min(offset + len(line) + 1, size)
+            if line_end - start > self.chunk_size and has_text:
+                yield start, offset, first_line, i - first_line
+                start, first_line, has_text = offset, i, False
+            has_text = has_text or bool(line.strip())
+            offset = line_end
+
+        if has_text:
+            yield start, offset, first_line, len(lines) - first_line
+
     def _add_overlap(self, chunks: list[CodeChunk]) -> list[CodeChunk]:
         if len(chunks) <= 1 or self.chunk_overlap <= 0:
             return chunks
 
-        overlapped: list[CodeChunk] = []
+        # The first part has nothing before it and is kept as is
+        overlapped: list[CodeChunk] = [chunks[0]]
 
-        for i, chunk in enumerate(chunks):
+        for prev_chunk, chunk in itertools.pairwise(chunks):
             content = chunk.content
             start_line = chunk.start_line
-            end_line = chunk.end_line
 
-            if i > 0:
-                prev_chunk = chunks[i - 1]
-                overlap_text = prev_chunk.content[-self.chunk_overlap :]
-                content = (overlap_text + "\n" + content) if overlap_text else content
+            overlap_text = prev_chunk.content[-self.chunk_overlap :]
+            if overlap_text:
+                content = f"{overlap_text}\n{content}"
                 # Adjust start_line based on overlap's line count
                 start_line = max(1, start_line - self._get_line_count(overlap_text))
 
@@ -483,7 +544,7 @@ class TreeSitterSplitter(BaseSplitter):
                     id=chunk.id,
                     content=content,
                     start_line=start_line,
-                    end_line=end_line,
+                    end_line=chunk.end_line,
                     language=chunk.language,
                     file_path=chunk.file_path,
                     doc=chunk.doc,
@@ -495,16 +556,16 @@ class TreeSitterSplitter(BaseSplitter):
         return overlapped
 
     def _get_line_count(self, text: str) -> int:
-        return len(text.splitlines()) if text else 0
+        # Lines are "\n"-delimited everywhere else in the splitter
+        return text.count("\n") + 1 if text else 0
 
-    def _make_sub_chunk_id(self, chunk: CodeChunk, part_index: int) -> str:
+    def _make_sub_chunk_ids(self, chunk: CodeChunk, count: int) -> list[str]:
         node_type = chunk.node.type if chunk.node is not None else "text"
-        identifier = f"{chunk.id}:part-{part_index}"
-        return make_chunk_id_from_components(
+        return make_chunk_ids_from_components(
             Path(chunk.file_path),
             node_type,
             chunk.parent_chunk_id,
-            identifier,
+            (f"{chunk.id}:part-{part_index}" for part_index in range(count)),
         )
 
     async def _fallback_text_split(self, code: str, file_path: Path) -> list[CodeChunk]:
@@ -512,56 +573,22 @@ class TreeSitterSplitter(BaseSplitter):
         if lang is None:
             return []
 
-        lines = code.split("\n")
+        windows = list(self._line_windows(code))
+        block_ids = make_chunk_ids_from_components(
+            file_path,
+            "text",
+            None,
+            (f"text-block-{block_index}" for block_index in range(len(windows))),
+        )
         chunks: list[CodeChunk] = []
 
-        current_chunk = ""
-        current_start_line = 1
-        block_index = 0
-
-        def next_block_id() -> str:
-            nonlocal block_index
-            identifier = f"text-block-{block_index}"
-            block_index += 1
-            return make_chunk_id_from_components(
-                file_path,
-                "text",
-                None,
-                identifier,
-            )
-
-        for i, line in enumerate(lines):
-            line_with_newline = line + ("\n" if i < len(lines) - 1 else "")
-
-            if (
-                len(current_chunk) + len(line_with_newline) > self.chunk_size
-                and current_chunk.strip()
-            ):
-                chunks.append(
-                    CodeChunk(
-                        id=next_block_id(),
-                        content=current_chunk.strip(),
-                        start_line=current_start_line,
-                        end_line=i,
-                        language=lang,
-                        file_path=file_path,
-                        doc=None,
-                        node=None,
-                        parent_chunk_id=None,
-                    )
-                )
-                current_chunk = line_with_newline
-                current_start_line = i + 1
-            else:
-                current_chunk += line_with_newline
-
-        if current_chunk.strip():
+        for block_id, (start, end, first_line, line_count) in zip(block_ids, windows):
             chunks.append(
                 CodeChunk(
-                    id=next_block_id(),
-                    content=current_chunk.strip(),
-                    start_line=current_start_line,
-                    end_line=len(lines),
+                    id=block_id,
+                    content=code[start:end].strip(),
+                    start_line=first_line + 1,
+                    end_line=first_line + line_count,
                     language=lang,
                     file_path=file_path,
                     doc=None,
@@ -571,3 +598,20 @@ class TreeSitterSplitter(BaseSplitter):
             )
 
         return chunks
+
+
+def _walk(node: Node) -> Iterator[tuple[Node, int]]:
+    """Pre-order walk yielding each node with its depth below `node`."""
+    cursor = node.walk()
+    depth = 0
+    while True:
+        current = cursor.node
+        assert current is not None
+        yield current, depth
+        if cursor.goto_first_child():
+            depth += 1
+            continue
+        while not cursor.goto_next_sibling():
+            if depth == 0 or not cursor.goto_parent():
+                return
+            depth -= 1
@@ -1,30 +1,35 @@
+import os
+from collections.abc import Mapping
 from pathlib import Path
+from types import MappingProxyType
 
 from tree_sitter_language_pack import SupportedLanguage
 
-_LANGUAGE_EXTENSIONS: dict[str, SupportedLanguage] = {
-    ".ts": "typescript",
-    ".tsx": "typescript",
-    ".js": "javascript",
-    ".jsx": "javascript",
-    ".py": "python",
-    ".java": "java",
-    ".cpp": "cpp",
-    ".c": "c",
-    ".h": "c",
-    ".hpp": "cpp",
-    ".cs": "csharp",
-    ".go": "go",
-    ".rs": "rust",
-    ".php": "php",
-    ".rb": "ruby",
-    ".swift": "swift",
-    ".kt": "kotlin",
-    ".scala": "scala",
-}
+_LANGUAGE_EXTENSIONS: Mapping[str, SupportedLanguage] = MappingProxyType(
+    {
+        ".ts": "typescript",
+        ".tsx": "typescript",
+        ".js": "javascript",
+        ".jsx": "javascript",
+        ".py": "python",
+        ".java": "java",
+        ".cpp": "cpp",
+        ".c": "c",
+        ".h": "c",
+        ".hpp": "cpp",
+        ".cs": "csharp",
+        ".go": "go",
+        ".rs": "rust",
+        ".php": "php",
+        ".rb": "ruby",
+        ".swift": "swift",
+        ".kt": "kotlin",
+        ".scala": "scala",
+    }
+)
 
 
-SPLITTABLE_NODE_TYPES: dict[SupportedLanguage, list[str]] = {
+_SPLITTABLE_NODE_LISTS: dict[SupportedLanguage, list[str]] = {
     "javascript": [
         "function_declaration",
         "class_declaration",
@@ -84,11 +89,13 @@ SPLITTABLE_NODE_TYPES: dict[SupportedLanguage, list[str]] = {
     ],
 }
 
+# Frozen so the splitter can share the tables across threads without copies
+SPLITTABLE_NODE_TYPES: Mapping[SupportedLanguage, frozenset[str]] = MappingProxyType(
+    {lang: frozenset(types) for lang, types in _SPLITTABLE_NODE_LISTS.items()}
+)
 
-SUPPORTED_EXTENSIONS = set(_LANGUAGE_EXTENSIONS.keys())
+SUPPORTED_EXTENSIONS = frozenset(_LANGUAGE_EXTENSIONS)
 
 
-def is_file_supported(path: Path) -> bool:
-    if path.is_file():
-        return path.suffix in SUPPORTED_EXTENSIONS
-    return True
+def is_file_supported(path: str | Path) -> bool:
+    return os.path.splitext(path)[1] in SUPPORTED_EXTENSIONS
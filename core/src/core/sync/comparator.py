@@ -1,7 +1,8 @@
+import asyncio
 from pathlib import Path
 
 from .content_readers import FileContentReader
-from .hash_utils import hash_file
+from .hash_utils import hash_files
 from .state import FileRecord
 from .types import DetectedChanges
 
@@ -11,45 +12,59 @@ async def compare_snapshot_to_current(
     old_files: dict[str, FileRecord],
     current_meta: dict[str, tuple[int, float, int | None]],
     content_reader: FileContentReader,
+    digests: dict[str, str] | None = None,
 ) -> DetectedChanges:
-    old_paths: set[str] = set(old_files.keys())
-    new_paths: set[str] = set(current_meta.keys())
-
-    added = sorted(list(new_paths - old_paths))
-    removed = sorted(list(old_paths - new_paths))
-    common = sorted(list(old_paths & new_paths))
+    # Key views support set operations, no intermediate sets are built
+    added = sorted(current_meta.keys() - old_files.keys())
+    removed = sorted(old_files.keys() - current_meta.keys())
+    common = old_files.keys() & current_meta.keys()
 
     modified: list[str] = []
 
-    # For common paths: if metadata changed -> compute hash and compare
+    # For common paths: if metadata changed -> compare hashes
+    to_hash: list[str] = []
     for p in common:
         size, mtime, inode = current_meta[p]
         old = old_files[p]
-        if old.size == size and old.mtime == mtime and old.inode == inode:
-            continue
-        # metadata changed; compute current hash and compare
-        curr_hash = hash_file(root / p, content_reader)
-        if curr_hash != old.hash:
+        if old.size != size:
+            # content of a different length cannot match, skip the hash
             modified.append(p)
-        # else: metadata changed but content same -> treat as unchanged
+        elif old.mtime != mtime or old.inode != inode:
+            to_hash.append(p)
 
-    # Attempt rename/move detection for added/removed pairs
-    added_set: set[str] = set(added)
-    removed_set: set[str] = set(removed)
-
-    # Build old inode -> path and old hash -> path maps
+    # Build old inode -> path map
     old_inode_map: dict[int, str] = {}
-    old_hash_map: dict[str, str] = {}
     for path, rec in old_files.items():
         if rec.inode is not None:
             old_inode_map[rec.inode] = path
-        old_hash_map[rec.hash] = path
+
+    # Added files are hashed for rename detection, all of them only when
+    # something was removed that they could have been renamed from
+    for new_p in added:
+        new_inode = current_meta[new_p][2]
+        if removed or (new_inode is not None and new_inode in old_inode_map):
+            to_hash.append(new_p)
+
+    hashes = await asyncio.to_thread(hash_files, root, to_hash, content_reader)
+    # Handed back so the new snapshot does not hash the same files again
+    if digests is not None:
+        digests.update(hashes)
+
+    for p in common:
+        curr_hash = hashes.get(p)
+        if curr_hash is not None and curr_hash != old_files[p].hash:
+            modified.append(p)
+        # else: metadata changed but content same -> treat as unchanged
+
+    # Attempt rename/move detection for added/removed pairs
+    added_set: set[str] = set(added)
+    removed_set: set[str] = set(removed)
 
     # 1) inode-based detection (verify content if metadata differs)
     to_remove_added: set[str] = set()
     to_remove_removed: set[str] = set()
 
-    for new_p in list(added_set):
+    for new_p in added_set:
         _, _, new_inode = current_meta[new_p]
         if new_inode is None:
             continue
@@ -58,8 +73,7 @@ async def compare_snapshot_to_current(
             continue
         # we found a candidate; must ensure content same to avoid missing modifications
         old_rec = old_files[old_p]
-        curr_hash = hash_file(root / new_p, content_reader)
-        if curr_hash == old_rec.hash:
+        if hashes[new_p] == old_rec.hash:
             to_remove_added.add(new_p)
             to_remove_removed.add(old_p)
         else:
@@ -71,23 +85,23 @@ async def compare_snapshot_to_current(
     removed_set -= to_remove_removed
 
     # 2) hash-based detection (for remaining added)
-    removed_hashes = {old_files[p].hash: p for p in removed_set}
-    to_remove_added = set()
-    to_remove_removed = set()
-    for new_p in list(added_set):
-        curr_hash = hash_file(root / new_p, content_reader)
-        old_p = removed_hashes.get(curr_hash)
-        if old_p:
-            to_remove_added.add(new_p)
-            to_remove_removed.add(old_p)
+    if added_set and removed_set:
+        removed_hashes = {old_files[p].hash: p for p in removed_set}
+        to_remove_added = set()
+        to_remove_removed = set()
+        for new_p in added_set:
+            old_p = removed_hashes.get(hashes.get(new_p, ""))
+            if old_p:
+                to_remove_added.add(new_p)
+                to_remove_removed.add(old_p)
 
-    added_set -= to_remove_added
-    removed_set -= to_remove_removed
+        added_set -= to_remove_added
+        removed_set -= to_remove_removed
 
     # Final lists
-    final_added = sorted(list(added_set))
-    final_removed = sorted(list(removed_set))
+    final_added = sorted(added_set)
+    final_removed = sorted(removed_set)
     # deduplicate modified
-    modified = sorted(list(dict.fromkeys(modified)))
+    modified = sorted(set(modified))
 
     return DetectedChanges(added=final_added, modified=modified, removed=final_removed)
@@ -7,7 +7,8 @@ from .protocol import FileContentReader
 class LocalFileContentReader(FileContentReader):
 
     def iter_bytes(self, path: Path, chunk_size: int = 65536) -> Iterable[bytes]:
-        with path.open("rb") as handle:
+        # Unbuffered, each read goes straight into the chunk handed out
+        with path.open("rb", buffering=0) as handle:
             while True:
                 chunk = handle.read(chunk_size)
                 if not chunk:
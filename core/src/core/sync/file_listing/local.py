@@ -1,11 +1,33 @@
+import asyncio
 import fnmatch
 import os
+import re
+import stat
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cache, lru_cache
 from pathlib import Path
+from typing import Literal
 
 from core.splitters import is_file_supported
 
 from .protocol import FileLister
 
+# Subtrees below the root are walked concurrently, scandir and stat release the GIL
+MAX_WALKERS = min(32, os.cpu_count() or 1)
+
+# How a rule is applied: to every directory part, the whole path, the name or,
+# for a "dir/**" pattern, to the directory whose contents it ignores
+_RuleKind = Literal["dir", "path", "name", "tree"]
+
+
+@dataclass(frozen=True, slots=True)
+class _IgnoreRule:
+    kind: _RuleKind
+    regex: re.Pattern[str]
+    negated: bool
+
 
 class LocalFileLister(FileLister):
 
@@ -13,101 +35,118 @@ class LocalFileLister(FileLister):
         self, root: Path, ignore_patterns: list[str] | frozenset[str] | None
     ) -> dict[str, tuple[int, float, int | None]]:
         root = root.resolve()
-        result: dict[str, tuple[int, float, int | None]] = {}
-        stack: list[Path] = [root]
-
-        gitignore_map: dict[str, list[tuple[str, bool]]] = {}
-        global_patterns: list[tuple[str, bool]] = [
-            (p.replace(os.sep, "/").strip("/"), False) for p in (ignore_patterns or [])
-        ]
-
-        while stack:
-            directory = stack.pop()
-            _record_gitignore_patterns(directory, root, gitignore_map)
-            _collect_entries(
-                directory,
-                root,
-                stack,
-                result,
-                global_patterns,
-                gitignore_map,
-            )
-
+        global_patterns = _compile_global_rules(tuple(ignore_patterns or ()))
+        return await asyncio.to_thread(_list_tree, root, global_patterns)
+
+
+def _list_tree(
+    root: Path, global_patterns: tuple[_IgnoreRule, ...]
+) -> dict[str, tuple[int, float, int | None]]:
+    gitignore_map: dict[str, tuple[_IgnoreRule, ...]] = {}
+    result: dict[str, tuple[int, float, int | None]] = {}
+    # The root is scanned first so its .gitignore is known to every subtree
+    subtrees: list[tuple[str, str]] = []
+    _record_gitignore_patterns(str(root), "", gitignore_map)
+    _collect_entries(str(root), "", subtrees, result, global_patterns, gitignore_map)
+    if not subtrees:
         return result
 
+    # Subtrees only add .gitignore entries under their own prefix
+    with ThreadPoolExecutor(max_workers=min(len(subtrees), MAX_WALKERS)) as pool:
+        for partial in pool.map(
+            lambda start: _walk([start], global_patterns, gitignore_map),
+            subtrees,
+        ):
+            result.update(partial)
+    return result
+
+
+def _walk(
+    stack: list[tuple[str, str]],
+    global_patterns: tuple[_IgnoreRule, ...],
+    gitignore_map: dict[str, tuple[_IgnoreRule, ...]],
+) -> dict[str, tuple[int, float, int | None]]:
+    result: dict[str, tuple[int, float, int | None]] = {}
+    # Directories still to scan with their relative prefix, kept as strings
+    while stack:
+        directory, rel_prefix = stack.pop()
+        _record_gitignore_patterns(directory, rel_prefix, gitignore_map)
+        _collect_entries(
+            directory,
+            rel_prefix,
+            stack,
+            result,
+            global_patterns,
+            gitignore_map,
+        )
+    return result
+
 
 def _record_gitignore_patterns(
-    directory: Path,
-    root: Path,
-    gitignore_map: dict[str, list[tuple[str, bool]]],
+    directory: str,
+    rel_prefix: str,
+    gitignore_map: dict[str, tuple[_IgnoreRule, ...]],
 ) -> None:
-    gitignore_file = directory / ".gitignore"
-    if not gitignore_file.is_file():
+    # A single open doubles as the existence check
+    try:
+        with open(os.path.join(directory, ".gitignore"), encoding="utf-8") as handle:
+            raw = handle.read()
+    except Exception:
         return
-    key = (
-        ""
-        if directory.resolve() == root.resolve()
-        else str(directory.relative_to(root)).replace(os.sep, "/").strip("/")
-    )
-    gitignore_map[key] = _parse_gitignore_file(gitignore_file, root)
+    dir_rel = rel_prefix.replace(os.sep, "/").strip("/")
+    gitignore_map[dir_rel] = _parse_gitignore(raw, dir_rel)
 
 
 def _collect_entries(
-    directory: Path,
-    root: Path,
-    stack: list[Path],
+    directory: str,
+    rel_prefix: str,
+    stack: list[tuple[str, str]],
     result: dict[str, tuple[int, float, int | None]],
-    global_patterns: list[tuple[str, bool]],
-    gitignore_map: dict[str, list[tuple[str, bool]]],
+    global_patterns: tuple[_IgnoreRule, ...],
+    gitignore_map: dict[str, tuple[_IgnoreRule, ...]],
 ) -> None:
+    # Every entry of a directory is matched against the same rule chain
+    rules = _scope_rules(rel_prefix, global_patterns, gitignore_map)
     try:
         with os.scandir(directory) as iterator:
             for entry in iterator:
-                try:
-                    rel = Path(entry.path).relative_to(root)
-                except Exception:
-                    rel = Path(str(entry.path).replace(str(root) + os.sep, "", 1))
-
-                if _is_ignored(
-                    rel,
-                    entry.is_dir(follow_symlinks=False),
-                    global_patterns,
-                    gitignore_map,
-                ):
+                rel = rel_prefix + entry.name
+                is_dir = entry.is_dir(follow_symlinks=False)
+
+                if _is_ignored(rel, entry.name, is_dir, rules, entry.path):
                     continue
 
-                if entry.is_dir(follow_symlinks=False):
-                    stack.append(Path(entry.path))
+                if is_dir:
+                    stack.append((entry.path, rel + os.sep))
                     continue
 
-                if entry.is_file(follow_symlinks=False):
-                    try:
-                        stat_info = entry.stat(follow_symlinks=False)
-                        inode = getattr(stat_info, "st_ino", None)
-                        result[str(rel)] = (
-                            stat_info.st_size,
-                            stat_info.st_mtime,
-                            int(inode) if inode is not None else None,
-                        )
-                    except Exception:
-                        continue
+                # One stat serves the regular file check and the metadata
+                try:
+                    stat_info = entry.stat(follow_symlinks=False)
+                except Exception:
+                    continue
+                if stat.S_ISREG(stat_info.st_mode):
+                    result[rel] = (
+                        stat_info.st_size,
+                        stat_info.st_mtime,
+                        stat_info.st_ino,
+                    )
     except Exception:
         return
 
 
-def _parse_gitignore_file(gitignore_path: Path, root: Path) -> list[tuple[str, bool]]:
-    try:
-        raw = gitignore_path.read_text(encoding="utf-8")
-    except Exception:
-        return []
+# Callers pass the same patterns on every scan, compile them once per process
+@lru_cache(maxsize=32)
+def _compile_global_rules(patterns: tuple[str, ...]) -> tuple[_IgnoreRule, ...]:
+    return tuple(
+        _compile_rules((p.replace(os.sep, "/").strip("/"), False) for p in patterns)
+    )
 
-    if gitignore_path.parent.resolve() == root.resolve():
-        dir_rel = ""
-    else:
-        dir_rel = (
-            str(gitignore_path.parent.relative_to(root)).replace(os.sep, "/").strip("/")
-        )
 
+# Parsing only depends on the text and its directory, so repeated scans of a
+# tree reuse the rules of every unchanged .gitignore
+@lru_cache(maxsize=512)
+def _parse_gitignore(raw: str, dir_rel: str) -> tuple[_IgnoreRule, ...]:
     parsed: list[tuple[str, bool]] = []
     for raw_line in raw.splitlines():
         line = raw_line.strip()
@@ -138,62 +177,122 @@ def _parse_gitignore_file(gitignore_path: Path, root: Path) -> list[tuple[str, b
         if pattern == "":
             continue
         parsed.append((pattern, is_negated))
-    return parsed
+    return tuple(_compile_rules(parsed))
 
 
 def _is_ignored(
-    rel_path: Path,
+    rel_path: str,
+    name: str,
     is_directory: bool,
-    global_patterns: list[tuple[str, bool]],
-    gitignore_map: dict[str, list[tuple[str, bool]]],
+    rules: list[_IgnoreRule],
+    path: str,
 ) -> bool:
-    if any(part.startswith(".") for part in rel_path.parts):
+    # Hidden parents are never descended into, only the entry itself is checked
+    if name.startswith("."):
         return True
 
-    if not is_directory and not is_file_supported(rel_path):
+    if not is_directory and not is_file_supported(name):
         return True
 
-    normalized = str(rel_path).replace(os.sep, "/").strip("/")
-    if not normalized:
-        return False
-
-    patterns: list[tuple[str, bool]] = []
+    normalized = rel_path.replace(os.sep, "/")
+    # A directory is pruned by its contents pattern unless a negation could
+    # re-include something beneath it, either later in the chain or in its own
+    # .gitignore, which git still reads when only the contents are ignored
+    reincludable = False
+    for rule in rules:
+        if rule.kind == "tree":
+            if (
+                not reincludable
+                and _match(normalized, name, rule, is_directory)
+                and not os.path.exists(os.path.join(path, ".gitignore"))
+            ):
+                return True
+            continue
+        if _match(normalized, name, rule, is_directory):
+            return not rule.negated
+        reincludable = reincludable or rule.negated
+    return False
+
+
+def _scope_rules(
+    rel_prefix: str,
+    global_patterns: tuple[_IgnoreRule, ...],
+    gitignore_map: dict[str, tuple[_IgnoreRule, ...]],
+) -> list[_IgnoreRule]:
+    patterns: list[_IgnoreRule] = []
     patterns.extend(global_patterns)
-    for ancestor in _ancestors_for(rel_path):
+    for ancestor in _ancestors_for(rel_prefix.replace(os.sep, "/")):
         ancestor_patterns = gitignore_map.get(ancestor)
         if ancestor_patterns:
             patterns.extend(ancestor_patterns)
-
-    ignored = False
-    for pattern, is_negated in patterns:
-        if _match(normalized, pattern, is_directory):
-            ignored = not is_negated
-    return ignored
+    # The last matching rule decides, so the chain runs innermost scope first
+    patterns.reverse()
+    return patterns
 
 
-def _ancestors_for(rel: Path) -> list[str]:
-    parent = rel.parent
-    if parent in (Path("."), Path("")):
-        return [""]
-    parts = list(parent.parts)
+def _ancestors_for(rel: str) -> list[str]:
+    # Every prefix ending before a separator, sliced rather than re-joined
     ancestors: list[str] = [""]
-    for index in range(len(parts)):
-        ancestors.append("/".join(parts[: index + 1]).strip("/"))
+    index = rel.find("/")
+    while index != -1:
+        ancestors.append(rel[:index])
+        index = rel.find("/", index + 1)
     return ancestors
 
 
-def _match(file_path: str, pattern: str, is_dir: bool) -> bool:
-    clean = pattern.strip("/")
-    if not clean:
-        return False
-    if pattern.endswith("/"):
-        if not is_dir:
-            return False
-        for part in file_path.split("/"):
-            if fnmatch.fnmatchcase(part, clean):
-                return True
+def _compile_rules(patterns: Iterable[tuple[str, bool]]) -> list[_IgnoreRule]:
+    # Consecutive rules with the same negation collapse into one regex per kind
+    rules: list[_IgnoreRule] = []
+    names: list[str] = []
+    paths: list[str] = []
+    run_negated = False
+    for pattern, is_negated in patterns:
+        clean = pattern.strip("/")
+        if not clean:
+            continue
+        if pattern.endswith("/"):
+            rules.extend(_flush_run(names, paths, run_negated))
+            rules.append(_IgnoreRule("dir", _compile_glob(clean), is_negated))
+            continue
+        if not is_negated and clean.endswith("/**") and len(clean) > 3:
+            rules.extend(_flush_run(names, paths, run_negated))
+            rules.append(_IgnoreRule("tree", _compile_glob(clean[:-3]), False))
+        if is_negated != run_negated:
+            rules.extend(_flush_run(names, paths, run_negated))
+            run_negated = is_negated
+        (paths if "/" in clean else names).append(fnmatch.translate(clean))
+    rules.extend(_flush_run(names, paths, run_negated))
+    return rules
+
+
+def _flush_run(names: list[str], paths: list[str], negated: bool) -> list[_IgnoreRule]:
+    rules: list[_IgnoreRule] = []
+    if names:
+        rules.append(_IgnoreRule("name", _compile_glob_sources(tuple(names)), negated))
+    if paths:
+        rules.append(_IgnoreRule("path", _compile_glob_sources(tuple(paths)), negated))
+    names.clear()
+    paths.clear()
+    return rules
+
+
+@cache
+def _compile_glob(pattern: str) -> re.Pattern[str]:
+    return re.compile(fnmatch.translate(pattern))
+
+
+@cache
+def _compile_glob_sources(sources: tuple[str, ...]) -> re.Pattern[str]:
+    return re.compile("|".join(sources), re.DOTALL)
+
+
+def _match(file_path: str, name: str, rule: _IgnoreRule, is_dir: bool) -> bool:
+    if rule.kind == "name":
+        return rule.regex.match(name) is not None
+    if rule.kind == "path":
+        return rule.regex.match(file_path) is not None
+    if not is_dir:
         return False
-    if "/" in clean:
-        return fnmatch.fnmatchcase(file_path, clean)
-    basename = Path(file_path).name
-    return fnmatch.fnmatchcase(basename, clean)
+    if rule.kind == "tree":
+        return rule.regex.match(file_path) is not None
+    return any(rule.regex.match(part) for part in file_path.split("/"))
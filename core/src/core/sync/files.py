@@ -1,3 +1,4 @@
+import asyncio
 from pathlib import Path
 
 from loguru import logger
@@ -5,7 +6,7 @@ from loguru import logger
 from .comparator import compare_snapshot_to_current
 from .content_readers import FileContentReader, LocalFileContentReader
 from .file_listing import FileLister, LocalFileLister
-from .hash_utils import hash_file
+from .hash_utils import hash_files
 from .state import FileRecord, FileStateRepository, SnapshotFileStateRepository
 from .types import DetectedChanges
 from .util import DEFAULT_IGNORE_PATTERNS
@@ -35,7 +36,7 @@ class FileSynchronizer:
         )
 
         if not self.state_repository.has_state(codebase_path):
-            initial_records = self._build_snapshot_records(
+            initial_records = await self._build_snapshot_records(
                 codebase_path, current_meta, {}
             )
             self.state_repository.save(codebase_path, initial_records)
@@ -43,13 +44,14 @@ class FileSynchronizer:
 
         old_files = self.state_repository.load(codebase_path)
 
+        digests: dict[str, str] = {}
         changes = await compare_snapshot_to_current(
-            codebase_path, old_files, current_meta, self.content_reader
+            codebase_path, old_files, current_meta, self.content_reader, digests
         )
 
         if changes.added or changes.modified or changes.removed:
-            new_records = self._build_snapshot_records(
-                codebase_path, current_meta, old_files
+            new_records = await self._build_snapshot_records(
+                codebase_path, current_meta, old_files, digests
             )
             self.state_repository.save(codebase_path, new_records)
 
@@ -74,13 +76,16 @@ class FileSynchronizer:
             logger.error("Failed to delete snapshot for {}: {}", codebase_path, exc)
             raise
 
-    def _build_snapshot_records(
+    async def _build_snapshot_records(
         self,
         codebase_path: Path,
         meta_map: dict[str, tuple[int, float, int | None]],
         prev_snapshot: dict[str, FileRecord],
+        known_digests: dict[str, str] | None = None,
     ) -> dict[str, FileRecord]:
-        records: dict[str, FileRecord] = {}
+        known = known_digests or {}
+        reused: dict[str, FileRecord] = {}
+        to_hash: list[str] = []
         for rel_path, (size, mtime, inode) in meta_map.items():
             previous = prev_snapshot.get(rel_path)
             if (
@@ -89,18 +94,28 @@ class FileSynchronizer:
                 and previous.mtime == mtime
                 and previous.inode == inode
             ):
-                records[rel_path] = previous
-                continue
-
-            file_path = codebase_path / rel_path
-            try:
-                digest = hash_file(file_path, self.content_reader)
-            except Exception:
-                continue
-            records[rel_path] = FileRecord(
-                size=size,
-                mtime=mtime,
-                inode=inode,
-                hash=digest,
-            )
+                reused[rel_path] = previous
+            elif rel_path not in known:
+                to_hash.append(rel_path)
+
+        # Unreadable files are left out of the snapshot
+        digests = known | await asyncio.to_thread(
+            hash_files,
+            codebase_path,
+            to_hash,
+            self.content_reader,
+            ignore_errors=True,
+        )
+
+        records: dict[str, FileRecord] = {}
+        for rel_path, (size, mtime, inode) in meta_map.items():
+            if rel_path in reused:
+                records[rel_path] = reused[rel_path]
+            elif (digest := digests.get(rel_path)) is not None:
+                records[rel_path] = FileRecord(
+                    size=size,
+                    mtime=mtime,
+                    inode=inode,
+                    hash=digest,
+                )
         return records
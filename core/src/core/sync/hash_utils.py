@@ -1,12 +1,55 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import xxhash
 
-from .content_readers import FileContentReader
+from .content_readers import FileContentReader, LocalFileContentReader
 
 
 def hash_file(path: Path, reader: FileContentReader, chunk_size: int = 65536) -> str:
+    if type(reader) is LocalFileContentReader:
+        return _hash_local_file(path, chunk_size)
     hasher = xxhash.xxh3_128()
     for chunk in reader.iter_bytes(path, chunk_size):
         hasher.update(chunk)
     return hasher.hexdigest()
+
+
+def _hash_local_file(path: Path, chunk_size: int) -> str:
+    # Reads straight from the descriptor, no file object or generator per file
+    hasher = xxhash.xxh3_128()
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        while chunk := os.read(fd, chunk_size):
+            hasher.update(chunk)
+    finally:
+        os.close(fd)
+    return hasher.hexdigest()
+
+
+def hash_files(
+    root: Path,
+    paths: list[str],
+    reader: FileContentReader,
+    max_workers: int = 16,
+    ignore_errors: bool = False,
+) -> dict[str, str]:
+    """Hash files under root concurrently, file reads release the GIL.
+
+    With ignore_errors, files that cannot be read are left out of the result.
+    """
+    if not paths:
+        return {}
+
+    def digest(path: str) -> str | None:
+        try:
+            return hash_file(root / path, reader)
+        except Exception:
+            if not ignore_errors:
+                raise
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as pool:
+        digests = pool.map(digest, paths)
+        return {p: d for p, d in zip(paths, digests) if d is not None}
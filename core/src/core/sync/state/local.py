@@ -1,11 +1,22 @@
 import json
+import os
+import struct
 from pathlib import Path
 
 import xxhash
 
 from .repository import FileRecord, FileStateRepository
 
-SNAPSHOT_VERSION = 1
+SNAPSHOT_VERSION = 3
+# Pretty-printed JSON snapshots written before the binary format
+LEGACY_SNAPSHOT_VERSION = 1
+
+# Header is magic, version, record count and paths length. Fields are stored as
+# columns: NUL separated utf-8 paths, then sizes, mtimes, inodes, whether each
+# inode is set and raw digests, so loading unpacks each column in one call
+_MAGIC = b"CCSS"
+_HEADER = struct.Struct("<4sIIQ")
+_DIGEST_SIZE = 16
 
 
 class SnapshotFileStateRepository(FileStateRepository):
@@ -18,10 +29,35 @@ class SnapshotFileStateRepository(FileStateRepository):
         self.snapshots_dir.mkdir(parents=True, exist_ok=True)
 
     def has_state(self, codebase_path: Path) -> bool:
-        return self._snapshot_path_for(codebase_path).exists()
+        return (
+            self._snapshot_path_for(codebase_path).exists()
+            or self._legacy_snapshot_path_for(codebase_path).exists()
+        )
 
     def load(self, codebase_path: Path) -> dict[str, FileRecord]:
         path = self._snapshot_path_for(codebase_path)
+        if not path.exists():
+            return self._load_legacy(codebase_path)
+        try:
+            return _decode_snapshot(path.read_bytes())
+        except Exception:
+            return {}
+
+    def save(self, codebase_path: Path, files: dict[str, FileRecord]) -> None:
+        snapshot_path = self._snapshot_path_for(codebase_path)
+        _write_atomic(snapshot_path, _encode_snapshot(files))
+        self._legacy_snapshot_path_for(codebase_path).unlink(missing_ok=True)
+
+    def delete(self, codebase_path: Path) -> None:
+        for path in (
+            self._snapshot_path_for(codebase_path),
+            self._legacy_snapshot_path_for(codebase_path),
+        ):
+            if path.exists():
+                path.unlink()
+
+    def _load_legacy(self, codebase_path: Path) -> dict[str, FileRecord]:
+        path = self._legacy_snapshot_path_for(codebase_path)
         if not path.exists():
             return {}
         try:
@@ -29,25 +65,75 @@ class SnapshotFileStateRepository(FileStateRepository):
             data = json.loads(raw)
         except Exception:
             return {}
-        if int(data.get("version", 0)) != SNAPSHOT_VERSION:
+        if int(data.get("version", 0)) != LEGACY_SNAPSHOT_VERSION:
             return {}
         files = data.get("files", {})
         return {p: FileRecord.from_dict(rec) for p, rec in files.items()}
 
-    def save(self, codebase_path: Path, files: dict[str, FileRecord]) -> None:
-        payload = {
-            "version": SNAPSHOT_VERSION,
-            "files": {path: record.to_dict() for path, record in files.items()},
-        }
-        snapshot_path = self._snapshot_path_for(codebase_path)
-        snapshot_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    def _snapshot_path_for(self, codebase_path: Path) -> Path:
+        return self.snapshots_dir / f"{self._snapshot_name_for(codebase_path)}.snap"
 
-    def delete(self, codebase_path: Path) -> None:
-        path = self._snapshot_path_for(codebase_path)
-        if path.exists():
-            path.unlink()
+    def _legacy_snapshot_path_for(self, codebase_path: Path) -> Path:
+        return self.snapshots_dir / f"{self._snapshot_name_for(codebase_path)}.json"
 
-    def _snapshot_path_for(self, codebase_path: Path) -> Path:
+    def _snapshot_name_for(self, codebase_path: Path) -> str:
         resolved = str(codebase_path.expanduser().resolve())
-        name = xxhash.xxh3_64_hexdigest(resolved.encode("utf-8"))
-        return self.snapshots_dir / f"{name}.json"
+        return xxhash.xxh3_64_hexdigest(resolved.encode("utf-8"))
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    # A crash mid-write leaves the previous snapshot in place, not a truncated one
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def _encode_snapshot(files: dict[str, FileRecord]) -> bytes:
+    count = len(files)
+    records = files.values()
+    paths = "\0".join(files).encode("utf-8")
+    return b"".join(
+        (
+            _HEADER.pack(_MAGIC, SNAPSHOT_VERSION, count, len(paths)),
+            paths,
+            struct.pack(f"<{count}Q", *(r.size for r in records)),
+            struct.pack(f"<{count}d", *(r.mtime for r in records)),
+            struct.pack(f"<{count}Q", *(r.inode or 0 for r in records)),
+            struct.pack(f"<{count}?", *(r.inode is not None for r in records)),
+            bytes.fromhex("".join(r.hash for r in records)),
+        )
+    )
+
+
+def _decode_snapshot(data: bytes) -> dict[str, FileRecord]:
+    magic, version, count, paths_len = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC or version != SNAPSHOT_VERSION or not count:
+        return {}
+
+    offset = _HEADER.size + paths_len
+    paths = str(memoryview(data)[_HEADER.size : offset], "utf-8").split("\0")
+    sizes = struct.unpack_from(f"<{count}Q", data, offset)
+    mtimes = struct.unpack_from(f"<{count}d", data, offset + 8 * count)
+    inodes = struct.unpack_from(f"<{count}Q", data, offset + 16 * count)
+    has_inodes = struct.unpack_from(f"<{count}?", data, offset + 24 * count)
+    offset += 25 * count
+    digests = data[offset : offset + _DIGEST_SIZE * count].hex()
+    step = 2 * _DIGEST_SIZE
+    return {
+        path: FileRecord(
+            size=size,
+            mtime=mtime,
+            inode=inode if has_inode else None,
+            hash=digests[i * step : (i + 1) * step],
+        )
+        for i, (path, size, mtime, inode, has_inode) in enumerate(
+            zip(paths, sizes, mtimes, inodes, has_inodes, strict=True)
+        )
+    }